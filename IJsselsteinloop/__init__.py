@@ -0,0 +1,70 @@
+"""
+Results of the IJsselsteinloop: scraping, storage, cleaning, enrichment and plotting helpers
+
+The functions live in submodules that are imported on first use (PEP 562), so `import IJsselsteinloop` is cheap and
+a script that only needs time_to_seconds or category never imports pandas, and the cleaning functions never import
+geopandas, requests, BeautifulSoup or tqdm:
+
+    hulp        category and time helpers (no heavy imports)
+    meten       instrumentation
+    schema      column layout and types, compact
+    ophalen     scraping and the response cache
+    opslag      Parquet partition store
+    opschonen   cleaning of names, woonplaatsen and times
+    verrijken   gemeenten, runner identity, aggregate cube and rank index
+    figuren     plotting helpers
+    verwerking  the cached pipeline
+    live        race-day polling of the results pages
+    dienst      local HTTP/JSON query service
+    evenementen chunked processing of many events in a process pool
+    kaarten     cache of the gemeente boundaries at a few resolutions
+"""
+
+import importlib
+
+
+MODULES = {'hulp': ['category', 'category_labels', 'time_to_seconds', 'parse_tijden'],
+           'meten': ['Instrumentatie', 'instrumentatie', 'instrumenteren', 'geinstrumenteerd'],
+           'schema': ['KLASSEMENTEN', 'Uitslag', 'ONBEKEND', 'SCHEMA', 'typeren', 'STRING', 'COMPACT', 'compact', 'compact_behouden',
+                      'geheugen_rapport'],
+           'ophalen': ['BASE_URL', 'MAX_WORKERS', 'RATE_LIMIT', 'RateLimiter', 'rate_limiter', 'ResponseCache', 'response_cache', 'get_session',
+                       'fetch', 'fetch_all', 'url_jaar', 'url_klassement', 'get_urls', 'parse_results', 'get_results', 'LEGACY', 'parse_tabel',
+                       'get_legacy', 'get_data_2002', 'get_data_2001', 'get_data_2000', 'get_data_1999', 'MAANDEN', 'KNMI_DAGGEGEVENS',
+                       'pasen', 'datum_ijsselsteinloop', 'knmi_daggegevens', 'ophalen_weer'],
+           'opslag': ['PARTITIES', 'ARROW_SCHEMA', 'partitie_pad', 'partities', 'schrijven_partities', 'importeren_csv', 'lezen_uitslagen',
+                      'ophalen_partities', 'ophalen_data', 'arrow_naar_pandas'],
+           'opschonen': ['ALIASSEN', 'per_waarde', 'nettotijd', 'nettotijd_sec', 'namen', 'plaatsnamen', 'woonplaats_aliassen', 'trigrammen',
+                         'PlaatsnaamIndex', 'plaatsnaam_index', 'voorstellen_woonplaatsen', 'woonplaatsen'],
+           'verrijken': ['AFSTANDEN', 'afstanden_bron', 'gemeente_afstanden', 'gemeenten', 'TUSSENVOEGSELS', 'naam_sleutel', 'lopers',
+                         'persoonlijke_records', 'deelnames', 'KUBUS', 'KUBUS_DIMENSIES', 'KWANTIELEN', 'kubus_berekenen', 'lezen_kubus', 'kubus_bijwerken',
+                         'kubus_opvragen', 'RangIndex'],
+           'figuren': ['bin_categories', 'replace_legend_items'],
+           'verwerking': ['PIPELINE_CACHE', 'Stage', 'bestanden_vingerafdruk', 'partities_vingerafdruk', 'afstanden_vingerafdruk', 'STAGES',
+                          'stabiele_repr', 'code_versie', 'pipeline', 'verwerken'],
+           'live': ['LiveUitslagen'],
+           'dienst': ['BESTANDEN', 'TABELLEN', 'UitslagenIndex', 'wijzigingstijden', 'Dienst'],
+           'evenementen': ['EVENEMENTEN', 'VERWERKT', 'CHUNK', 'VERWERKT_SCHEMA', 'ophalen_evenementen', 'verwerken_partitie',
+                           'verwerken_in_delen'],
+           'kaarten': ['KAART', 'KAART_CACHE', 'RESOLUTIES', 'vereenvoudigen', 'kaart_pad', 'kaart_bron', 'kaart_cache_bouwen', 'kaart',
+                       'resolutie_voor']}
+
+NAMEN = {naam: module for module, namen in MODULES.items() for naam in namen}
+
+__all__ = list(NAMEN)
+
+
+def __getattr__(naam):
+    """
+    Imports the submodule of naam on first use; the value is looked up on every access and not copied into the package,
+    so module state such as instrumentatie or response_cache is always the submodule's current value
+    """
+
+    if naam in MODULES:
+        return importlib.import_module(f'.{naam}', __name__)
+    if naam in NAMEN:
+        return getattr(importlib.import_module(f'.{NAMEN[naam]}', __name__), naam)
+    raise AttributeError(f'module {__name__!r} has no attribute {naam!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(NAMEN) | set(MODULES))
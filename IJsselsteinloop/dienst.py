@@ -0,0 +1,245 @@
+"""
+Local HTTP/JSON query service over the enriched results, run with: python -m IJsselsteinloop.dienst [--jaar 2019] [--port 8000]
+
+The results are loaded once and indexed in memory; the service reloads them when the data files change.
+
+    /namen?prefix=jan de v&limiet=50                               results of names with a word starting with prefix
+    /top?jaar=2019&afstand=10 km&klassement=Herenklassement&n=10  fastest results of a race
+    /gemeente?gemeente=Lopik[&jaar=2019]                           results of the runners from a gemeente
+    /startnummer?jaar=2019&startnummer=123                         result of a startnummer
+    /loper?runner_id=42                                            all results of a runner (lopers)
+    /status                                                        number of rows and time of the last load
+"""
+
+import numpy as np
+import pandas as pd
+import argparse
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from .opschonen import ALIASSEN, plaatsnaam_index, plaatsnamen, woonplaats_aliassen
+from .opslag import PARTITIES, partities
+from .verrijken import AFSTANDEN
+from .verwerking import verwerken
+
+
+logger = logging.getLogger(__name__)
+
+# files the enriched results are computed from, directories include their files
+BESTANDEN = [PARTITIES, ALIASSEN, AFSTANDEN, Path('data/plaatsnaam_gemeente.csv'), Path('data/2019_gemeentegrenzen_kustlijn.gpkg')]
+
+# tables read from those files and cached in the process, cleared before a reload
+TABELLEN = [plaatsnamen, woonplaats_aliassen, plaatsnaam_index]
+
+
+class UitslagenIndex:
+    """
+    In-memory indexes over the results, built once: word prefixes of naam, (jaar, afstand, klassement) sorted by
+    nettotijd, gemeente (and jaar), (jaar, startnummer) and runner_id; queries return the matching rows as a DataFrame
+    """
+
+    def __init__(self, uitslagen):
+        self.uitslagen = uitslagen.reset_index(drop=True)
+
+        # every word of a name starts an entry, so 'vries' and 'jan de v' both find 'Jan de Vries'
+        woorden = [(naam[i:], positie) for positie, naam in enumerate(self.uitslagen.naam.fillna('').astype(str).str.casefold())
+                   for i in range(len(naam)) if naam[i] != ' ' and (i == 0 or naam[i - 1] == ' ')]
+        woorden.sort()
+        self.woorden = [woord for woord, _ in woorden]
+        self.woord_posities = np.array([positie for _, positie in woorden], dtype=np.int64)
+
+        tijden = self.uitslagen.nettotijd_sec.astype(float).fillna(np.inf).to_numpy() if 'nettotijd_sec' in self.uitslagen else np.zeros(len(self.uitslagen))
+        volgorde = np.argsort(tijden, kind='stable')
+        races = self.uitslagen.iloc[volgorde].groupby(['jaar', 'afstand', 'klassement'], observed=True).indices
+        self.races = {sleutel: volgorde[posities] for sleutel, posities in races.items()}
+        self.gemeenten = self.uitslagen.groupby('gemeente', observed=True).indices if 'gemeente' in self.uitslagen else dict()
+        self.gemeente_jaren = self.uitslagen.groupby(['gemeente', 'jaar'], observed=True).indices if 'gemeente' in self.uitslagen else dict()
+        # startnummer is str in the output of the pipeline and Int32 after typeren or compact, keyed as str for both
+        startnummers = self.uitslagen.startnummer
+        if pd.api.types.is_numeric_dtype(startnummers):
+            startnummers = startnummers.astype('Int64')
+        self.startnummers = self.uitslagen.groupby([self.uitslagen.jaar, startnummers.astype(str).str.strip().rename('startnummer')], observed=True).indices
+        self.lopers = self.uitslagen.groupby('runner_id').indices if 'runner_id' in self.uitslagen else dict()
+
+    def rijen(self, posities):
+        return self.uitslagen.iloc[np.sort(np.asarray(posities, dtype=np.int64))]
+
+    def namen(self, prefix, limiet=50):
+        """
+        Returns the results of the names with a word starting with prefix (case-insensitive), at most limiet
+        """
+
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return self.uitslagen.iloc[:0]
+        start = bisect.bisect_left(self.woorden, prefix)
+        eind = bisect.bisect_left(self.woorden, prefix + '\U0010ffff', start)
+        return self.rijen(pd.unique(self.woord_posities[start:eind])[:limiet])
+
+    def top(self, jaar, afstand, klassement, n=10):
+        """
+        Returns the n fastest results of a race
+        """
+
+        return self.uitslagen.iloc[self.races.get((jaar, afstand, klassement), [])[:n]]
+
+    def gemeente(self, gemeente, jaar=None):
+        """
+        Returns the results of the runners from gemeente, of one year or all years
+        """
+
+        return self.rijen(self.gemeenten.get(gemeente, []) if jaar is None else self.gemeente_jaren.get((gemeente, jaar), []))
+
+    def startnummer(self, jaar, startnummer):
+        """
+        Returns the result(s) of a startnummer (str or int) in jaar
+        """
+
+        return self.rijen(self.startnummers.get((jaar, str(startnummer).strip()), []))
+
+    def loper(self, runner_id):
+        """
+        Returns the results of a runner, sorted by jaar
+        """
+
+        return self.rijen(self.lopers.get(runner_id, [])).sort_values(['jaar', 'afstand'])
+
+
+def wijzigingstijden(bestanden=BESTANDEN):
+    """
+    Returns the path, modification time and size of the files, directories replaced by the files in them,
+    a cheap fingerprint to notice changed data files
+    """
+
+    paden = list()
+    for path in map(Path, bestanden):
+        paden.extend(sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path])
+    return tuple((str(path), path.stat().st_mtime_ns, path.stat().st_size) for path in paden if path.is_file())
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answers the queries of the service with the matching rows as a JSON array of records
+    """
+
+    queries = {'/namen': lambda index, q: index.namen(q['prefix'], int(q.get('limiet', 50))),
+               '/top': lambda index, q: index.top(int(q['jaar']), q['afstand'], q['klassement'], int(q.get('n', 10))),
+               '/gemeente': lambda index, q: index.gemeente(q['gemeente'], int(q['jaar']) if 'jaar' in q else None),
+               '/startnummer': lambda index, q: index.startnummer(int(q['jaar']), q['startnummer']),
+               '/loper': lambda index, q: index.loper(int(q['runner_id']))}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        dienst = self.server.dienst
+        index = dienst.index # the index of this request, even if a reload replaces it meanwhile
+        if url.path == '/status':
+            self.antwoorden(200, pd.Series({'rijen': len(index.uitslagen), 'geladen': dienst.geladen}).to_json())
+        elif url.path not in self.queries:
+            self.antwoorden(404, pd.Series({'fout': f'unknown query {url.path}'}).to_json())
+        else:
+            try:
+                uitslagen = self.queries[url.path](index, query)
+            except (KeyError, ValueError) as e:
+                self.antwoorden(400, pd.Series({'fout': f'invalid or missing parameter: {e}'}).to_json())
+            else:
+                self.antwoorden(200, uitslagen.to_json(orient='records', force_ascii=False))
+
+    def antwoorden(self, status, tekst):
+        body = tekst.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class Dienst:
+    """
+    The query service: loads the results with laden() into an UitslagenIndex and serves it from a ThreadingHTTPServer,
+    one thread per client. Every interval seconds a watcher thread compares the modification times of bestanden and
+    reloads when they changed; the new index replaces the old one at once, so requests never see a partial index.
+    laden: function returning the enriched results
+    """
+
+    def __init__(self, laden, bestanden=BESTANDEN, host='127.0.0.1', port=8000, interval=5):
+        self.laden = laden
+        self.bestanden = bestanden
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.vingerafdruk = wijzigingstijden(bestanden)
+        self.index = UitslagenIndex(laden())
+        self.geladen = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.dienst = self
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def herladen(self):
+        """
+        Reloads the results when the data files changed since the last load, returns whether it did;
+        the cached tables (TABELLEN) are read again
+        """
+
+        with self.lock:
+            vingerafdruk = wijzigingstijden(self.bestanden)
+            if vingerafdruk == self.vingerafdruk:
+                return False
+            for tabel in TABELLEN:
+                tabel.cache_clear()
+            self.index = UitslagenIndex(self.laden())
+            self.vingerafdruk = vingerafdruk
+            self.geladen = time.strftime('%Y-%m-%d %H:%M:%S')
+            logger.info('reloaded %d rows', len(self.index.uitslagen))
+            return True
+
+    def bewaken(self):
+        while not self.stop.wait(self.interval):
+            try:
+                self.herladen()
+            except Exception:
+                logger.exception('reload failed, serving the previous data')
+
+    def starten(self):
+        """
+        Serves in background threads, returns self
+        """
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.bewaken, daemon=True).start()
+        return self
+
+    def stoppen(self):
+        self.stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local query service over the IJsselsteinloop results')
+    parser.add_argument('--jaar', type=int, default=None, help='last year, default the last year in the partition store')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--interval', type=float, default=5, help='seconds between checks for changed data files')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    dienst = Dienst(lambda: verwerken(args.jaar or max(partities())), host=args.host, port=args.port, interval=args.interval)
+    print(f'serving {len(dienst.index.uitslagen)} results on {dienst.url}')
+    threading.Thread(target=dienst.bewaken, daemon=True).start()
+    try:
+        dienst.server.serve_forever()
+    except KeyboardInterrupt:
+        dienst.stoppen()
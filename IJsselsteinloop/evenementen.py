@@ -0,0 +1,100 @@
+"""
+Chunked processing of many events in a process pool, with memory bounded by the chunk size and the largest klassement
+"""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .ophalen import LEGACY, MAX_WORKERS
+from .opschonen import namen, nettotijd, nettotijd_sec, woonplaatsen
+from .opslag import ARROW_SCHEMA, arrow_naar_pandas, ophalen_partities, partitie_pad, partities
+from .verrijken import gemeente_afstanden, gemeenten
+
+
+EVENEMENTEN = Path('data/evenementen') # partition store per event: data/evenementen/{evenement}/jaar={jaar}.parquet
+VERWERKT = Path('data/verwerkt') # cleaned and enriched results: data/verwerkt/{evenement}/jaar={jaar}.parquet
+CHUNK = 100_000 # rows per chunk
+
+# column types of the cleaned and enriched results
+VERWERKT_SCHEMA = ARROW_SCHEMA.append(pa.field('gemeente', pa.string())).append(pa.field('tot_ijsselstein', pa.float64()))
+
+
+def ophalen_evenementen(evenementen, jaren, max_workers=MAX_WORKERS, offline=False, directory=EVENEMENTEN, legacy=None):
+    """
+    Fetches the years missing from the partition store of each event, returns the manifests {evenement: {jaar: codes}}
+    evenementen: {evenement: base_url} of events that publish their results in the layout of the IJsselsteinloop
+    legacy: {evenement: specs} of the years of an event in an older layout (get_legacy), default LEGACY for the event
+        'ijsselsteinloop' only; the years of other events are all read in the current layout
+    """
+
+    legacy = {'ijsselsteinloop': LEGACY} if legacy is None else legacy
+    manifesten = dict()
+    for evenement, base_url in evenementen.items():
+        store = Path(directory) / evenement
+        ontbrekend = [jaar for jaar in jaren if jaar not in partities(store)]
+        manifesten[evenement] = (ophalen_partities(ontbrekend, max_workers, offline, store, base_url, legacy.get(evenement, dict()))
+                                 if ontbrekend else partities(store))
+    return manifesten
+
+
+def verwerken_partitie(invoer, uitvoer, afstanden, chunk=CHUNK, drempel=None):
+    """
+    Cleans and enriches one partition chunk by chunk (namen, woonplaatsen, nettotijd, gemeenten, nettotijd_sec),
+    writing each chunk as a row group of uitvoer, so only one chunk of results is in memory at a time. Parquet decodes
+    a whole row group of invoer at once, one per klassement in the partition store, so the memory also grows with the
+    largest klassement of a year. gemeenten drops duplicate startnummers per race within a chunk only: rows of invoer
+    that repeat a startnummer in another chunk are all kept, where verwerken keeps one of them.
+    Returns the number of rows read and written.
+    """
+
+    rijen_in, rijen_uit = 0, 0
+    Path(uitvoer).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(uitvoer).with_suffix('.parquet.tmp')
+    with pq.ParquetWriter(tmp, VERWERKT_SCHEMA) as writer:
+        for batch in pq.ParquetFile(invoer).iter_batches(batch_size=chunk):
+            uitslagen = arrow_naar_pandas(pa.Table.from_batches([batch]))
+            rijen_in += len(uitslagen)
+            uitslagen = nettotijd_sec(gemeenten(nettotijd(woonplaatsen(namen(uitslagen), drempel)), afstanden))
+            uitslagen = uitslagen[VERWERKT_SCHEMA.names].astype({'jaar': 'int16'})
+            writer.write_table(pa.Table.from_pandas(uitslagen, VERWERKT_SCHEMA, preserve_index=False))
+            rijen_uit += len(uitslagen)
+    os.replace(tmp, uitvoer)
+    return rijen_in, rijen_uit
+
+
+def verwerken_in_delen(evenementen=None, jaren=None, directory=EVENEMENTEN, uitvoer=VERWERKT, chunk=CHUNK, max_workers=None,
+                       drempel=None, afstanden=None):
+    """
+    Cleans and enriches the partitions of many events in a process pool, one task per event and year, each streamed
+    through the cleaning steps in chunks of at most chunk rows and written to uitvoer/{evenement}/jaar={jaar}.parquet;
+    the memory of a process depends on the chunk and the largest klassement (see verwerken_partitie), not on the size
+    of the whole dataset
+    evenementen: names of the events in directory, default all
+    jaren: years to process, default all in the partition stores
+    afstanden: table gemeente -> tot_ijsselstein, defaults to gemeente_afstanden()
+    Returns the rows read and written per evenement and jaar.
+
+    Example
+    =======
+    ophalen_evenementen({'ijsselsteinloop': BASE_URL}, range(2003, 2020))
+    verwerken_in_delen(['ijsselsteinloop'])
+    pd.read_parquet('data/verwerkt/ijsselsteinloop')
+    """
+
+    afstanden = gemeente_afstanden() if afstanden is None else afstanden
+    if evenementen is None:
+        evenementen = sorted(path.name for path in Path(directory).iterdir() if (path / 'partities.json').is_file())
+    taken = [(evenement, jaar) for evenement in evenementen for jaar, codes in partities(Path(directory) / evenement).items()
+             if codes and (jaren is None or jaar in jaren)]
+
+    resultaten = list()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(verwerken_partitie, partitie_pad(jaar, Path(directory) / evenement), partitie_pad(jaar, Path(uitvoer) / evenement),
+                                   afstanden, chunk, drempel): (evenement, jaar) for evenement, jaar in taken}
+        for future in as_completed(futures):
+            resultaten.append((*futures[future], *future.result()))
+    return pd.DataFrame(resultaten, columns=['evenement', 'jaar', 'rijen_in', 'rijen_uit']).sort_values(['evenement', 'jaar']).reset_index(drop=True)
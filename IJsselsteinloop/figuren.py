@@ -0,0 +1,65 @@
+"""
+Plotting helpers: binning values into map categories and relabelling legends
+"""
+
+import numpy as np
+import pandas as pd
+
+from .hulp import category_labels
+
+
+def bin_categories(values, categories, labels=None, lower=None, out_of_range='raise'):
+    """
+    Returns an ordered categorical with the label of the upper category boundary for each value, like category,
+    for a whole Series at once. The codes (.cat.codes) are the positions of the upper boundaries in categories.
+    values: Series of numbers, also nullable Int32 or Float64
+    categories: ascending upper category boundaries
+    labels: dictionary {boundary: label}, defaults to category_labels(categories)
+    lower: lowest value of the first category, default unbounded
+    out_of_range: values above the last boundary or below lower 'raise' a ValueError, become 'nan',
+        or are 'clip'ped into the first or last category
+    Missing values stay missing.
+
+    Example
+    =======
+    bin_categories(pd.Series([1, 25, 50]), [10, 20, 30, 40, 50]).tolist()
+    ['1 - 10', '21 - 30', '41 - 50']
+    """
+
+    values = pd.Series(values)
+    boundaries = np.asarray(categories)
+    labels = category_labels(list(categories)) if labels is None else labels
+
+    # nullable Int32/Float64 values (compact, a left merge) have pd.NA, which is NaN here and never out of range
+    codes = np.searchsorted(boundaries, values.to_numpy(dtype=float, na_value=np.nan), side='left')
+    overflow = values.notna().to_numpy() & (codes == len(boundaries))
+    underflow = (values < lower).fillna(False).to_numpy(dtype=bool) if lower is not None else np.zeros(len(values), dtype=bool)
+
+    if overflow.any() or underflow.any():
+        if out_of_range == 'raise':
+            raise ValueError(f'Values outside the categories: {sorted(set(values[overflow | underflow]))}')
+        elif out_of_range == 'nan':
+            codes[overflow | underflow] = -1
+        elif out_of_range == 'clip':
+            codes[overflow] = len(boundaries) - 1
+            codes[underflow] = 0
+        else:
+            raise ValueError(f"out_of_range should be 'raise', 'nan' or 'clip', not {out_of_range!r}")
+    codes[values.isna().to_numpy()] = -1
+
+    return pd.Series(pd.Categorical.from_codes(codes, [labels[boundary] for boundary in categories], ordered=True), index=values.index)
+
+
+def replace_legend_items(legend, mapping):
+    """
+    Function to replace legend item lables in a figure.
+
+    Example
+    =======
+    replace_legend_items(ax.get_legend(), {10: '1 - 10', 20: '11 - 20', 30: '21 - 30', 40: '31 - 40', 50: '41 - 50'})
+    """
+    
+    for txt in legend.texts:
+        for k, v in mapping.items():
+            if txt.get_text() == str(k):
+                txt.set_text(v)
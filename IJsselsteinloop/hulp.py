@@ -0,0 +1,80 @@
+"""
+Category and time helpers, without heavy imports: numpy is imported on first use of parse_tijden
+"""
+
+
+def category(num, categories):
+    """
+    Returns the upper category boundary for a given number based on a list met upper category boundaries.
+
+    Example
+    =======
+    category(25, [10, 20, 30, 40, 50])
+    30
+    """
+
+    for boundary in categories:
+        if num <= boundary:
+            return boundary
+
+
+def category_labels(categories):
+    """
+    Returns a dictionary with upper category boundaries and a category label.
+    The lower boundary for the first category is set to one.
+
+    Example
+    =======
+    category_labels([10, 20, 30, 40, 50])
+    {10: '1 - 10', 20: '11 - 20', 30: '21 - 30', 40: '31 - 40', 50: '41 - 50'}
+    """
+
+    boundaries = [0] + categories
+    labels = dict()
+    for i in range(1, len(categories) + 1):
+        labels[boundaries[i]] = f'{boundaries[i-1] + 1} - {boundaries[i]}'
+    return labels
+
+
+def time_to_seconds(time):
+    """
+    Convert a timestring in 'HH:MM:SS' format to seconds
+    """
+
+    hrs_min_sec = map(int, time.split(':')) # hours, minutes and seconds
+    multipliers = {'hour': 3600, 'minute': 60, 'second': 1}
+    return sum([x*y for x, y in zip(hrs_min_sec, multipliers.values())])
+
+
+def parse_tijden(tijden):
+    """
+    Returns the times in seconds of a column of times in 'HH:MM:SS', 'HH.MM.SS', 'H:MM:SS' or 'MM:SS' format
+    as an int32 array, and a boolean mask of the values that could not be parsed (and are 0 in the array).
+    The strings are right-aligned on a 'HH:MM:SS' template and parsed as one fixed-width array of characters.
+
+    Example
+    =======
+    parse_tijden(['01:23:45', '01.23.45', '23:45', 'DNF'])
+    (array([5025, 5025, 1425, 0], dtype=int32), array([False, False, False,  True]))
+    """
+
+    import numpy as np
+
+    tekst = np.array(np.asarray(tijden, dtype=object), dtype='U9') # NaN -> 'nan', 9th character: too long
+    tekens = tekst.view(np.uint32).reshape(len(tekst), 9).astype(np.int32)
+    lengte = (tekens != 0).sum(axis=1)
+    tekens = tekens[:, :8]
+
+    # right-align shorter times on the template, e.g. '23:45' -> '00:23:45'
+    kort = np.flatnonzero(lengte < 8)
+    if kort.size:
+        positie = np.arange(8) - (8 - lengte[kort])[:, None]
+        tekens[kort] = np.where(positie >= 0, np.take_along_axis(tekens[kort], np.clip(positie, 0, None), axis=1), [ord(c) for c in '00:00:00'])
+
+    cijfers = tekens[:, [0, 1, 3, 4, 6, 7]] - ord('0')
+    uren, minuten, seconden = [cijfers[:, i] * 10 + cijfers[:, i + 1] for i in [0, 2, 4]]
+    scheidingstekens = (tekens[:, [2, 5]] == ord(':')) | (tekens[:, [2, 5]] == ord('.'))
+    ongeldig = ((lengte < 4) | (lengte > 8) | ~scheidingstekens.all(axis=1)
+                | (cijfers.astype(np.uint32) > 9).any(axis=1) | (minuten > 59) | (seconden > 59))
+
+    return np.where(ongeldig, 0, uren * 3600 + minuten * 60 + seconden).astype(np.int32), ongeldig
@@ -0,0 +1,105 @@
+"""
+Cache of the gemeente boundaries: the GeoPackage is read once and stored as GeoParquet at a few resolutions,
+with the centroids of the full geometries
+"""
+
+import geopandas as gpd
+import functools
+import json
+import os
+from pathlib import Path
+
+
+KAART = Path('data/2019_gemeentegrenzen_kustlijn.gpkg')
+KAART_CACHE = Path('data/cache/kaart') # data/cache/kaart/{GeoPackage name}/{resolutie}.parquet
+
+# tolerance of the simplification per resolution in metres (RD New coordinates), from full detail to coarsest
+RESOLUTIES = {'vol': 0, 'fijn': 25, 'middel': 100, 'grof': 500}
+
+
+def vereenvoudigen(geometrie, tolerantie):
+    """
+    Returns the geometries simplified with tolerantie. With shapely >= 2.1 the gemeenten are simplified as a coverage,
+    so neighbours keep sharing their borders; before that each polygon is simplified on its own, preserving its topology.
+    """
+
+    import shapely
+
+    if not tolerantie:
+        return geometrie
+    if hasattr(shapely, 'coverage_simplify'):
+        return gpd.GeoSeries(shapely.coverage_simplify(geometrie.to_numpy(), tolerantie), index=geometrie.index, crs=geometrie.crs)
+    return geometrie.simplify(tolerantie, preserve_topology=True)
+
+
+def kaart_pad(resolutie, gpkg=KAART, directory=KAART_CACHE):
+    """
+    Returns the path of the GeoParquet file of a resolution, e.g. data/cache/kaart/2019_gemeentegrenzen_kustlijn/middel.parquet
+    """
+
+    return Path(directory) / Path(gpkg).stem / f'{resolutie}.parquet'
+
+
+def kaart_bron(gpkg=KAART):
+    """
+    Returns what the cache of a GeoPackage is built from: its path, modification time and size and the resolutions
+    """
+
+    stat = Path(gpkg).stat()
+    return {'gpkg': str(gpkg), 'mtime_ns': stat.st_mtime_ns, 'grootte': stat.st_size, 'resoluties': RESOLUTIES}
+
+
+def kaart_cache_bouwen(gpkg=KAART, directory=KAART_CACHE):
+    """
+    Reads the GeoPackage and writes every resolution of RESOLUTIES as GeoParquet, each with the centroid of the full
+    geometry in centroid_x and centroid_y, so distances do not depend on the resolution
+    Returns the description of the source stored with the cache (kaart_bron).
+    """
+
+    gemeenten = gpd.read_file(gpkg)
+    centroiden = gemeenten.geometry.centroid
+    gemeenten['centroid_x'], gemeenten['centroid_y'] = centroiden.x, centroiden.y
+
+    for resolutie, tolerantie in RESOLUTIES.items():
+        path = kaart_pad(resolutie, gpkg, directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.parquet.tmp')
+        gemeenten.set_geometry(vereenvoudigen(gemeenten.geometry, tolerantie)).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    bron = kaart_bron(gpkg)
+    path = kaart_pad('bron', gpkg, directory).with_suffix('.json')
+    tmp = path.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(bron, indent=1))
+    os.replace(tmp, path)
+    return bron
+
+
+@functools.lru_cache()
+def kaart(resolutie='middel', gpkg=KAART, directory=KAART_CACHE):
+    """
+    Returns the gemeente boundaries at a resolution of RESOLUTIES with centroid_x and centroid_y, and the spatial
+    index built. The cache is built first when it is missing or the GeoPackage changed. The GeoDataFrame is shared
+    by all callers in the process: merge or copy it, do not modify it in place.
+
+    Example
+    =======
+    kaart(resolutie_voor(1200)) # for a map of 1200 pixels wide
+    """
+
+    bron = kaart_pad('bron', gpkg, directory).with_suffix('.json')
+    if not bron.is_file() or json.loads(bron.read_text()) != kaart_bron(gpkg):
+        kaart_cache_bouwen(gpkg, directory)
+    gemeenten = gpd.read_parquet(kaart_pad(resolutie, gpkg, directory))
+    gemeenten.sindex # built now rather than at the first spatial query
+    return gemeenten
+
+
+def resolutie_voor(breedte_px, breedte_m=280000):
+    """
+    Returns the coarsest resolution whose tolerance is at most one pixel of a map breedte_px pixels wide
+    breedte_m: width of the area drawn in metres, default the Netherlands
+    """
+
+    pixel = breedte_m / breedte_px
+    return max((resolutie for resolutie, tolerantie in RESOLUTIES.items() if tolerantie <= pixel), key=RESOLUTIES.get)
@@ -0,0 +1,100 @@
+"""
+Race-day polling of the results pages: only changed pages are parsed and only new or changed rows are cleaned
+"""
+
+import pandas as pd
+import hashlib
+import logging
+import requests
+import time
+
+from .ophalen import BASE_URL, MAX_WORKERS, fetch_all, get_session, get_urls, parse_results, url_klassement
+from .opschonen import namen, nettotijd, nettotijd_sec, woonplaatsen
+from .schema import KLASSEMENTEN, Uitslag, typeren
+from .verrijken import gemeente_afstanden, gemeenten
+
+
+logger = logging.getLogger(__name__)
+
+
+class LiveUitslagen:
+    """
+    Polls the results pages of jaar on race day with conditional requests (If-None-Match / If-Modified-Since, see fetch).
+    A poll parses only the pages whose content changed and returns only the rows that are new or changed since the
+    previous poll, keyed by klassement and startnummer, cleaned and enriched like verwerken (without lopers, which needs
+    all years). The work per poll depends on the changed pages and rows, not on the number of finishers so far.
+    afstanden: table gemeente -> tot_ijsselstein, defaults to gemeente_afstanden()
+
+    Example
+    =======
+    for wijzigingen in LiveUitslagen(2020).volgen(interval=30):
+        print(wijzigingen[['wijziging', 'klassement', 'startnummer', 'naam', 'nettotijd']])
+    """
+
+    def __init__(self, jaar, base_url=BASE_URL, max_workers=MAX_WORKERS, drempel=None, afstanden=None):
+        self.jaar = jaar
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.drempel = drempel
+        self.session = get_session(max_workers)
+        self.afstanden = gemeente_afstanden() if afstanden is None else afstanden
+        self.inhoud = dict() # url -> hash of the content parsed last
+        self.rijen = dict() # (klassement code, startnummer) -> Uitslag as last seen
+
+    def wijzigingen(self, url, content):
+        """
+        Returns [(Uitslag, 'nieuw' or 'gewijzigd')] for the rows of a page that are new or differ from the previous poll;
+        rows without a startnummer are keyed by naam
+        """
+
+        code = url_klassement(url)
+        wijzigingen = list()
+        for uitslag in parse_results(content, url):
+            sleutel = (code, uitslag.startnummer.strip() or uitslag.naam.strip())
+            vorige = self.rijen.get(sleutel)
+            if vorige != uitslag:
+                self.rijen[sleutel] = uitslag
+                wijzigingen.append((uitslag, 'nieuw' if vorige is None else 'gewijzigd'))
+        return wijzigingen
+
+    def peilen(self):
+        """
+        Polls the results pages once, returns the new and changed rows with column wijziging ('nieuw' or 'gewijzigd'),
+        an empty DataFrame when nothing changed
+        """
+
+        urls = [url for url in get_urls(self.jaar, self.jaar, self.base_url, 1) if url_klassement(url) in KLASSEMENTEN]
+        wijzigingen = list()
+        for url, content in zip(urls, fetch_all(urls, self.max_workers, self.session)):
+            h = hashlib.sha1(content).digest()
+            if self.inhoud.get(url) == h:
+                continue # not modified
+            self.inhoud[url] = h
+            wijzigingen.extend(self.wijzigingen(url, content))
+
+        if not wijzigingen:
+            return pd.DataFrame(columns=list(Uitslag._fields) + ['wijziging'])
+        uitslagen = typeren(pd.DataFrame.from_records([uitslag for uitslag, _ in wijzigingen], columns=Uitslag._fields))
+        uitslagen['wijziging'] = [wijziging for _, wijziging in wijzigingen]
+        uitslagen = woonplaatsen(namen(uitslagen), self.drempel)
+        return nettotijd_sec(gemeenten(nettotijd(uitslagen), self.afstanden))
+
+    def volgen(self, interval=30, peilingen=None):
+        """
+        Yields the new and changed rows of each poll in which something changed, polling every interval seconds,
+        until stopped or for peilingen polls; a poll that fails (e.g. before the results are published) is logged and skipped
+        """
+
+        peiling = 0
+        while peilingen is None or peiling < peilingen:
+            start = time.monotonic()
+            try:
+                wijzigingen = self.peilen()
+            except requests.RequestException as e:
+                logger.warning('poll of %s failed: %s', self.jaar, e)
+            else:
+                if len(wijzigingen):
+                    yield wijzigingen
+            peiling += 1
+            if peilingen is None or peiling < peilingen:
+                time.sleep(max(0, interval - (time.monotonic() - start)))
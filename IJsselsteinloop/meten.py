@@ -0,0 +1,127 @@
+"""
+Instrumentation of the pipeline functions: wall time, peak memory, rows and HTTP requests per call
+"""
+
+import pandas as pd
+import contextlib
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+
+class Instrumentatie:
+    """
+    Measurements of the instrumented functions: wall time, peak memory, rows in and out, woonplaatsen that are NaN
+    and the HTTP requests made during the call, written as a JSON line to uitvoer as each call finishes
+    uitvoer: path or text stream, None to only collect the measurements
+    """
+
+    def __init__(self, uitvoer=None):
+        self.uitvoer = uitvoer
+        self.metingen = list()
+        self.lock = threading.Lock()
+        self.http = {'http_requests': 0, 'http_cache': 0, 'http_bytes': 0, 'http_latency': 0.0}
+        self.pieken = list() # peak traced memory of the calls in progress
+
+    def request(self, bytes, latency=0.0, cache=False):
+        with self.lock:
+            self.http['http_requests'] += 1
+            self.http['http_cache'] += cache
+            self.http['http_bytes'] += bytes
+            self.http['http_latency'] += latency
+
+    def meten(self, functie, args, kwargs):
+        invoer = next((arg for arg in args if isinstance(arg, pd.DataFrame)), None)
+        meting = {'functie': functie.__name__, 'rijen_in': None if invoer is None else len(invoer),
+                  'woonplaats_nan_in': int(invoer.woonplaats.isna().sum()) if 'woonplaats' in getattr(invoer, 'columns', []) else None}
+        with self.lock:
+            http = dict(self.http)
+
+        # nested calls reset the peak, keep the caller's peak so far
+        if self.pieken:
+            self.pieken[-1] = max(self.pieken[-1], tracemalloc.get_traced_memory()[1])
+        if hasattr(tracemalloc, 'reset_peak'): # Python 3.9+, before that the peak since instrumenteren started
+            tracemalloc.reset_peak()
+        geheugen = tracemalloc.get_traced_memory()[0]
+        self.pieken.append(geheugen)
+        start = time.perf_counter()
+        try:
+            uitvoer = functie(*args, **kwargs)
+        finally:
+            meting['tijd'] = time.perf_counter() - start
+            piek = max(self.pieken.pop(), tracemalloc.get_traced_memory()[1])
+            if self.pieken:
+                self.pieken[-1] = max(self.pieken[-1], piek)
+
+        meting['geheugen'] = piek - geheugen
+        meting['rijen_uit'] = len(uitvoer) if isinstance(uitvoer, pd.DataFrame) else None
+        meting['rijen_verwijderd'] = None if None in (meting['rijen_in'], meting['rijen_uit']) else meting['rijen_in'] - meting['rijen_uit']
+        meting['woonplaats_nan_uit'] = int(uitvoer.woonplaats.isna().sum()) if 'woonplaats' in getattr(uitvoer, 'columns', []) else None
+        with self.lock:
+            meting.update({key: value - http[key] for key, value in self.http.items()})
+        self.metingen.append(meting)
+        if isinstance(self.uitvoer, (str, Path)):
+            with open(self.uitvoer, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(meting) + '\n')
+        elif self.uitvoer is not None:
+            self.uitvoer.write(json.dumps(meting) + '\n')
+        return uitvoer
+
+    def samenvatting(self):
+        """
+        Returns the measurements per function: number of calls, total time, largest peak memory and totals of the counts
+        """
+
+        metingen = pd.DataFrame(self.metingen, columns=['functie', 'tijd', 'geheugen', 'rijen_in', 'rijen_uit', 'rijen_verwijderd',
+                                                        'woonplaats_nan_in', 'woonplaats_nan_uit'] + list(self.http))
+        samenvatting = metingen.groupby('functie', sort=False).agg(
+            aanroepen=('tijd', 'size'), tijd=('tijd', 'sum'), geheugen=('geheugen', 'max'),
+            **{kolom: (kolom, lambda x: x.sum(min_count=1)) for kolom in metingen.columns[3:]})
+        return samenvatting.sort_values('tijd', ascending=False)
+
+
+instrumentatie = None # active Instrumentatie, see instrumenteren
+
+
+@contextlib.contextmanager
+def instrumenteren(uitvoer=None, tabel=False):
+    """
+    Measures the instrumented functions called within the context, yields the Instrumentatie
+    uitvoer: path or text stream to which each measurement is written as a JSON line
+    tabel: print the summary per function on exit
+
+    Example
+    =======
+    with instrumenteren('metingen.jsonl', tabel=True):
+        verwerken(2019)
+    """
+
+    global instrumentatie
+    vorige, instrumentatie = instrumentatie, Instrumentatie(uitvoer)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        yield instrumentatie
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+        meting, instrumentatie = instrumentatie, vorige
+        if tabel:
+            print(meting.samenvatting().to_string())
+
+
+def geinstrumenteerd(functie):
+    """
+    Decorator that measures calls of functie within instrumenteren, without it the function is called directly
+    """
+
+    @functools.wraps(functie)
+    def wrapper(*args, **kwargs):
+        if instrumentatie is None:
+            return functie(*args, **kwargs)
+        return instrumentatie.meten(functie, args, kwargs)
+    return wrapper
@@ -0,0 +1,397 @@
+"""
+Scraping of the results and the KNMI weather data, with a pooled, rate-limited session and a response cache
+"""
+
+import numpy as np
+import pandas as pd
+import datetime
+import functools
+import hashlib
+import io
+import json
+import lxml.html
+import os
+import requests
+import threading
+import time
+import zipfile
+from bs4 import BeautifulSoup, UnicodeDammit
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+
+from . import meten
+from .meten import geinstrumenteerd
+from .schema import KLASSEMENTEN, Uitslag
+
+
+BASE_URL = 'https://www.ijsselsteinloop.nl/'
+MAX_WORKERS = 8 # concurrent requests
+RATE_LIMIT = 10 # requests per second per host
+
+
+class RateLimiter:
+    """
+    Limits the number of requests per second for each host, shared by all worker threads
+    """
+
+    def __init__(self, rate=RATE_LIMIT):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = dict()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = RateLimiter()
+
+
+class ResponseCache:
+    """
+    On-disk cache of page contents with their ETag and Last-Modified headers, keyed by url
+    """
+
+    def __init__(self, directory='data/cache'):
+        self.directory = Path(directory)
+
+    def path(self, url):
+        return self.directory / hashlib.sha1(url.encode()).hexdigest()
+
+    def get(self, url):
+        """
+        Returns (content, headers) for a cached url or None
+        """
+
+        path = self.path(url)
+        if not path.with_suffix('.json').is_file():
+            return None
+        headers = json.loads(path.with_suffix('.json').read_text())
+        return path.with_suffix('.body').read_bytes(), headers
+
+    def put(self, url, content, headers):
+        """
+        Stores content with the ETag and Last-Modified response headers; the body is written first,
+        so a crash never leaves headers without a body
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(url)
+        for suffix, data in [('.body', content),
+                             ('.json', json.dumps({'url': url, 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}).encode())]:
+            tmp = path.with_suffix(f'{suffix}.{threading.get_ident()}.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, path.with_suffix(suffix))
+
+
+response_cache = ResponseCache()
+
+
+def get_session(max_workers=MAX_WORKERS, retries=3, backoff_factor=0.5):
+    """
+    Returns a requests session with a keep-alive connection pool sized to the number of workers
+    and retries with exponential backoff on connection errors and 429/5xx responses
+    """
+
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch(url, session=None, limiter=rate_limiter, cache=None, offline=False):
+    """
+    Returns the content of a single page
+    A cached page is revalidated with If-None-Match / If-Modified-Since and served from the cache on 304 Not Modified.
+    With offline=True pages are served from the cache only.
+    cache: ResponseCache, defaults to response_cache
+    """
+
+    cache = response_cache if cache is None else cache
+    cached = cache.get(url)
+
+    if offline:
+        if cached is None:
+            raise FileNotFoundError(f'No cached response for {url}')
+        if meten.instrumentatie is not None:
+            meten.instrumentatie.request(0, cache=True)
+        return cached[0]
+
+    headers = dict()
+    if cached is not None:
+        if cached[1]['etag']:
+            headers['If-None-Match'] = cached[1]['etag']
+        if cached[1]['last_modified']:
+            headers['If-Modified-Since'] = cached[1]['last_modified']
+
+    if session is None:
+        session = get_session(1)
+    if limiter is not None:
+        limiter.wait(url)
+    start = time.perf_counter()
+    r = session.get(url, headers=headers)
+    if meten.instrumentatie is not None:
+        meten.instrumentatie.request(len(r.content), time.perf_counter() - start, r.status_code == 304 and cached is not None)
+    if r.status_code == 304 and cached is not None:
+        return cached[0]
+    r.raise_for_status()
+    cache.put(url, r.content, r.headers)
+    return r.content
+
+
+def fetch_all(urls, max_workers=MAX_WORKERS, session=None, limiter=rate_limiter, cache=None, offline=False, progress=False):
+    """
+    Returns the content of all pages in the same order as urls, fetched concurrently by at most max_workers threads
+    """
+
+    urls = list(urls)
+    if session is None:
+        session = get_session(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        contents = executor.map(lambda url: fetch(url, session, limiter, cache, offline), urls)
+        if progress:
+            contents = tqdm(contents, total=len(urls))
+        return list(contents)
+
+
+def url_jaar(url):
+    """
+    Returns the year of a results page url, e.g. .../uitslag/2019/uitslag2019h12.htm -> 2019
+    """
+
+    return int(url.split('/')[-2])
+
+
+def url_klassement(url):
+    """
+    Returns the klassement code of a results page url, e.g. .../uitslag/2019/uitslag2019h12.htm -> 'h12'
+    """
+
+    return url.split('/')[-1][11:].split('.')[0]
+
+
+@geinstrumenteerd
+def get_urls(start_year, end_year, base_url=BASE_URL, max_workers=MAX_WORKERS, offline=False):
+    """
+    Get the urls for the pages on which the race results are published
+    """
+
+    years = [str(year) for year in range(start_year, end_year + 1)]
+    pages = fetch_all([base_url + 'uitslag/' + year + '/index.htm' for year in years], max_workers, offline=offline)
+    urls = list()
+    for year, content in zip(years, pages):
+        soup = BeautifulSoup(content, 'lxml')
+        results_urls = [url['href'] for url in soup.find_all('a') if url['href'][:7] == 'uitslag']
+        for results_url in ['{}uitslag/{}/{}'.format(base_url, year, results_url) for results_url in results_urls]:
+            urls.append(results_url)
+    return urls
+
+
+def parse_results(content, url):
+    """
+    Yields an Uitslag record for every row of the results table on a results page, in a single lxml pass
+    content: page content as returned by fetch
+    url: page url, used for the year and klassement
+    """
+
+    jaar = url_jaar(url)
+    klassement, afstand = KLASSEMENTEN.get(url_klassement(url), (np.nan, np.nan))
+    table = lxml.html.fromstring(UnicodeDammit(content, is_html=True).unicode_markup).find('.//table')
+
+    for i, table_row in enumerate(table.iter('tr')):
+        if i == 0:
+            continue # header
+        variables = table_row.findall('td')
+        if len(variables) >= 6:
+            columns = [1, 2, 3, 5]
+        elif len(variables) == 5:
+            columns = [1, 2, 3, 4]
+        else:
+            continue
+        startnummer, naam, woonplaats, nettotijd = [variables[col].text_content() for col in columns]
+        yield Uitslag(startnummer, naam, woonplaats, nettotijd, jaar, klassement, afstand)
+
+
+@geinstrumenteerd
+def get_results(urls, max_workers=MAX_WORKERS, offline=False):
+    """
+    Get the actual race results from the pages on which they are published
+    urls: page urls on which the race results are published
+    """
+
+    records = [record for url, content in zip(urls, fetch_all(urls, max_workers, offline=offline, progress=True))
+               for record in parse_results(content, url)]
+    return pd.DataFrame.from_records(records, columns=Uitslag._fields)
+
+
+# layout of the results of the years before the results pages of get_results, all on uitslag/{jaar}/index.htm:
+# tabellen: klassement -> index of the table on the page, or with links: of the link to the Excel file with the results
+# cellen: columns of the cells after the first (Excel: of the sheet's columns), header: first row is a header
+# kolommen: columns of the returned DataFrame, missing columns are NaN
+LEGACY = {1999: {'tabellen': {'Herenklassement': 0, 'Damesklassement': 2}, 'cellen': ['naam', 'nettotijd'], 'header': False,
+                 'kolommen': ['naam', 'nettotijd', 'klassement', 'startnummer', 'woonplaats', 'jaar', 'afstand']},
+          2000: {'tabellen': {'Herenklassement': 0, 'Damesklassement': 1}, 'cellen': ['naam', 'nettotijd'], 'header': False,
+                 'kolommen': ['naam', 'nettotijd', 'klassement', 'startnummer', 'woonplaats', 'jaar', 'afstand']},
+          2001: {'tabellen': {'Herenklassement': 0, 'Damesklassement': 1}, 'cellen': ['startnummer', 'naam', 'woonplaats', 'nettotijd'], 'header': True,
+                 'kolommen': ['startnummer', 'naam', 'woonplaats', 'nettotijd', 'klassement', 'jaar', 'afstand']},
+          2002: {'tabellen': {'Herenklassement': 1, 'Damesklassement': 2}, 'links': True, 'hernoemen': {'WOONPLAATS': 'PLAATS'},
+                 'cellen': ['startnummer', 'naam', 'woonplaats', 'nettotijd'],
+                 'kolommen': ['startnummer', 'naam', 'woonplaats', 'nettotijd', 'jaar', 'klassement', 'afstand']}}
+
+
+def parse_tabel(table, cellen, header):
+    """
+    Returns a DataFrame with the stripped text of the cells after the first of every row of a table
+    """
+
+    rows = [[cell.text_content().strip() for cell in row.iter('td')][1:] for row in table.iter('tr')]
+    return pd.DataFrame(rows[1:] if header else rows, columns=cellen)
+
+
+def get_legacy(jaren, max_workers=MAX_WORKERS, offline=False, base_url=BASE_URL, legacy=LEGACY):
+    """
+    Returns the results of the years in legacy, parsed as described by their spec
+    The index pages of all years and the linked Excel files are fetched concurrently.
+    legacy: specs {jaar: spec} of the site at base_url, default those of the IJsselsteinloop
+    """
+
+    jaren = [jaar for jaar in jaren if jaar in legacy]
+    base_urls = [f'{base_url}uitslag/{jaar}/' for jaar in jaren]
+    pages = [lxml.html.fromstring(UnicodeDammit(content, is_html=True).unicode_markup)
+             for content in fetch_all([url + 'index.htm' for url in base_urls], max_workers, offline=offline)]
+
+    # Excel files linked from the index page
+    links = [(jaar, klassement, base + page.xpath('//a/@href')[i]) for jaar, base, page in zip(jaren, base_urls, pages)
+             if legacy[jaar].get('links') for klassement, i in legacy[jaar]['tabellen'].items()]
+    excel = dict(zip([link[:2] for link in links], fetch_all([link[2] for link in links], max_workers, offline=offline)))
+
+    uitslagen = list()
+    for jaar, page in zip(jaren, pages):
+        spec = legacy[jaar]
+        frames = list()
+        for klassement, i in spec['tabellen'].items():
+            if spec.get('links'):
+                df = pd.read_excel(io.BytesIO(excel[(jaar, klassement)])).dropna().rename(columns=spec.get('hernoemen', dict()))
+            else:
+                df = parse_tabel(page.xpath('//table')[i], spec['cellen'], spec['header'])
+            df['klassement'] = klassement
+            frames.append(df)
+        df = pd.concat(frames, sort=False, ignore_index=True)
+        df.columns = spec['cellen'] + ['klassement']
+        df['jaar'] = jaar
+        df['afstand'] = '21.1 km'
+        uitslagen.append(df.reindex(columns=spec['kolommen']))
+
+    return pd.concat(uitslagen, sort=False, ignore_index=True) if uitslagen else pd.DataFrame(columns=Uitslag._fields)
+
+
+@geinstrumenteerd
+def get_data_2002(offline=False):
+    """
+    Returns a DataFrame with the data
+    """
+
+    return get_legacy([2002], offline=offline)
+
+
+@geinstrumenteerd
+def get_data_2001(offline=False):
+    """
+    Returns a DataFrame with the data
+    """
+
+    return get_legacy([2001], offline=offline)
+
+
+@geinstrumenteerd
+def get_data_2000(offline=False):
+    """
+    Returns a DataFrame with the data
+    """
+
+    return get_legacy([2000], offline=offline)
+
+
+@geinstrumenteerd
+def get_data_1999(offline=False):
+    """
+    Returns a DataFrame with the data
+    """
+
+    return get_legacy([1999], offline=offline)
+
+
+MAANDEN = ['januari', 'februari', 'maart', 'april', 'mei', 'juni', 'juli', 'augustus', 'september', 'oktober', 'november', 'december']
+KNMI_DAGGEGEVENS = 'https://cdn.knmi.nl/knmi/map/page/klimatologie/gegevens/daggegevens/etmgeg_{station}.zip'
+
+
+def pasen(jaar):
+    """
+    Returns the date of Easter Sunday (anonymous Gregorian computus)
+    """
+
+    a, b, c = jaar % 19, jaar // 100, jaar % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    maand = (h + l - 7 * m + 90) // 25
+    dag = (h + l - 7 * m + 33 * maand + 19) % 32
+    return datetime.date(jaar, maand, dag)
+
+
+def datum_ijsselsteinloop(jaar):
+    """
+    Returns the date of the IJsselsteinloop, the Saturday before Whit Sunday (Easter + 49 days)
+    """
+
+    return pasen(jaar) + datetime.timedelta(days=48)
+
+
+@functools.lru_cache()
+def knmi_daggegevens(station=260, offline=False):
+    """
+    Returns the daily weather data of a KNMI station (260: De Bilt) indexed by date, from the station's zipped
+    etmgeg file, which is downloaded once and revalidated through the response cache
+    Columns as in the KNMI file, e.g. TG: daily mean temperature in 0.1 degrees Celsius
+    """
+
+    with zipfile.ZipFile(io.BytesIO(fetch(KNMI_DAGGEGEVENS.format(station=station), offline=offline))) as z:
+        tekst = z.read(z.namelist()[0]).decode('latin-1')
+    regels = tekst.splitlines()
+    header = next(i for i, regel in enumerate(regels) if 'STN,YYYYMMDD' in regel.replace(' ', ''))
+    kolommen = regels[header].lstrip('# ').replace(' ', '').split(',')
+    data = pd.read_csv(io.StringIO('\n'.join(regels[header + 1:])), names=kolommen, skipinitialspace=True, dtype={'YYYYMMDD': str})
+    data.index = pd.to_datetime(data.pop('YYYYMMDD'), format='%Y%m%d')
+    return data
+
+
+@geinstrumenteerd
+def ophalen_weer(start_jaar, eind_jaar, offline=False):
+    """
+    Datums IJsselsteinloop en de gemiddelde temperatuur in De Bilt.
+    The dates are computed from the date of Easter and the temperatures are looked up in the KNMI daily data of
+    De Bilt, so after the first download of that file no requests are made.
+    """
+
+    datums = [datum_ijsselsteinloop(jaar) for jaar in range(start_jaar, eind_jaar + 1)]
+    tg = knmi_daggegevens(260, offline).TG.reindex(pd.to_datetime(datums))
+
+    data = pd.DataFrame({'temperatuur': tg.to_numpy() / 10},
+                        index=pd.Index([f'{datum.day}-{MAANDEN[datum.month - 1]}-{datum.year}' for datum in datums], name='datum'))
+
+    data.to_csv(f'data/weer_{start_jaar}_{eind_jaar}.csv')
+    return data
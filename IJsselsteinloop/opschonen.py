@@ -0,0 +1,207 @@
+"""
+Cleaning of the results: names, woonplaatsen and finish times
+"""
+
+import numpy as np
+import pandas as pd
+import functools
+import heapq
+import json
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .hulp import parse_tijden
+from .meten import geinstrumenteerd
+from .schema import STRING, compact_behouden
+
+
+ALIASSEN = Path('data/woonplaatsen_aliassen.json')
+
+
+def per_waarde(waarden, functie):
+    """
+    Returns functie applied once to each distinct value of a column, NaN stays NaN
+    Categorical and string columns keep their type, other columns become object.
+    """
+
+    codes, uniques = pd.factorize(waarden)
+    nieuw = [functie(waarde) for waarde in np.asarray(uniques, dtype=object)]
+    if isinstance(waarden.dtype, pd.CategoricalDtype):
+        nieuwe_codes, categorieen = pd.factorize(pd.Series(nieuw, dtype=object))
+        codes = np.where(codes >= 0, nieuwe_codes[codes], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, categorieen), index=waarden.index, name=waarden.name)
+    waarden = pd.Series(np.array(nieuw + [np.nan], dtype=object)[codes], index=waarden.index, name=waarden.name)
+    return waarden.astype(STRING) if isinstance(uniques.dtype, pd.StringDtype) else waarden
+
+
+@geinstrumenteerd
+@compact_behouden
+def nettotijd(uitslagen):
+    """
+    Format nettotijd to "HH:MM:SS"
+    """
+
+    uitslagen['nettotijd'] = per_waarde(uitslagen.nettotijd, lambda tijd: tijd.replace('.', ':') if isinstance(tijd, str) else np.nan)
+
+    return uitslagen
+
+
+@geinstrumenteerd
+@compact_behouden
+def nettotijd_sec(uitslagen):
+    """
+    Convert nettotijd to nettotijd in seconds
+    Times that cannot be parsed become <NA> in a nullable integer column.
+    """
+
+    seconden, ongeldig = parse_tijden(uitslagen.nettotijd)
+    if ongeldig.any():
+        uitslagen['nettotijd_sec'] = pd.array(seconden, dtype='Int64')
+        uitslagen.loc[ongeldig, 'nettotijd_sec'] = pd.NA
+    else:
+        uitslagen['nettotijd_sec'] = seconden.astype(np.int64)
+
+    uitslagen = uitslagen.sort_values(by=['jaar', 'afstand', 'klassement', 'nettotijd_sec']).reset_index(drop=True)
+
+    return uitslagen
+
+
+@geinstrumenteerd
+@compact_behouden
+def namen(uitslagen):
+    """
+    Opschonen namen
+    """
+    
+    uitslagen['naam'] = per_waarde(uitslagen.naam, lambda naam: naam.strip() if isinstance(naam, str) else np.nan)
+    
+    for naam in ['Erik Vijverberg', 'Fiso Glansdorp', 'Toby scharing', 'Carola sijbrandij']:
+        uitslagen['naam'] = uitslagen.naam.mask(uitslagen.woonplaats == naam, naam)
+
+    return uitslagen
+
+
+@functools.lru_cache()
+def plaatsnamen(path='data/plaatsnaam_gemeente.csv'):
+    """
+    Returns the set of known place names
+    """
+
+    return frozenset(pd.read_csv(path).plaatsnaam)
+
+
+@functools.lru_cache()
+def woonplaats_aliassen(path=ALIASSEN):
+    """
+    Returns the alias table compiled into a single lookup {alias: woonplaats}
+    The rules in the file are applied in order, so an alias renamed by an earlier rule and renamed again
+    by a later rule resolves to the last name.
+    """
+
+    regels = json.loads(Path(path).read_text(encoding='utf-8'))['aliassen']
+    regels = [(regel['woonplaats'], set(regel['aliassen'])) for regel in regels]
+
+    lookup = dict()
+    for alias in set().union(*[aliassen for _, aliassen in regels]):
+        woonplaats = alias
+        for naam, aliassen in regels:
+            if woonplaats in aliassen:
+                woonplaats = naam
+        lookup[alias] = woonplaats
+    return lookup
+
+
+def trigrammen(tekst):
+    """
+    Returns the set of lowercase character trigrams of a text, padded to include the start and end of the text
+    """
+
+    tekst = f'  {tekst.lower()} '
+    return {tekst[i:i + 3] for i in range(len(tekst) - 2)}
+
+
+class PlaatsnaamIndex:
+    """
+    Trigram index over the known place names for fuzzy lookup of unknown woonplaatsen
+    Candidates sharing trigrams are ranked by Dice coefficient; only the best candidates are scored
+    with difflib's edit-based similarity ratio, so a lookup never compares against all names.
+    """
+
+    def __init__(self, namen, kandidaten=10):
+        self.namen = sorted(namen)
+        self.kandidaten = kandidaten
+        self.aantallen = list()
+        self.index = defaultdict(list)
+        for i, naam in enumerate(self.namen):
+            grams = trigrammen(naam)
+            self.aantallen.append(len(grams))
+            for gram in grams:
+                self.index[gram].append(i)
+
+    def zoeken(self, woonplaats):
+        """
+        Returns (plaatsnaam, score) of the best matching known place name, with a score between 0 and 1
+        """
+
+        grams = trigrammen(woonplaats)
+        gedeeld = Counter(i for gram in grams for i in self.index.get(gram, ()))
+        if not gedeeld:
+            return None, 0.0
+        kandidaten = heapq.nlargest(self.kandidaten, gedeeld, key=lambda i: 2 * gedeeld[i] / (len(grams) + self.aantallen[i]))
+        score, naam = max((SequenceMatcher(None, woonplaats.lower(), self.namen[i].lower()).ratio(), self.namen[i]) for i in kandidaten)
+        return naam, score
+
+
+@functools.lru_cache()
+def plaatsnaam_index(path='data/plaatsnaam_gemeente.csv'):
+    """
+    Returns the PlaatsnaamIndex over the known place names
+    """
+
+    return PlaatsnaamIndex(plaatsnamen(path))
+
+
+@geinstrumenteerd
+def voorstellen_woonplaatsen(uitslagen, drempel=0.9):
+    """
+    Returns proposed aliases for the woonplaatsen that are neither known place names nor in the alias table,
+    with a match score of at least drempel, most frequent first
+    uitslagen: results before woonplaatsen, which sets unknown places to NaN
+    """
+
+    aliassen = woonplaats_aliassen()
+    bekend = plaatsnamen()
+    index = plaatsnaam_index()
+
+    onbekend = uitslagen.woonplaats.dropna().str.strip().map(lambda woonplaats: aliassen.get(woonplaats, woonplaats))
+    onbekend = onbekend[~onbekend.isin(bekend)].value_counts()
+    voorstellen = pd.DataFrame([(woonplaats, *index.zoeken(woonplaats), aantal) for woonplaats, aantal in onbekend.items()],
+                               columns=['woonplaats', 'voorstel', 'score', 'aantal'])
+    return voorstellen[voorstellen.score >= drempel].reset_index(drop=True)
+
+
+@geinstrumenteerd
+@compact_behouden
+def woonplaatsen(uitslagen, drempel=None):
+    """
+    Opschonen woonplaatsen
+    Each distinct woonplaats is stripped and resolved once through the alias table; places that are not in
+    data/plaatsnaam_gemeente.csv are set to NaN, or with a drempel (e.g. 0.9) replaced by the best fuzzy match
+    with at least that score.
+    """
+
+    aliassen = woonplaats_aliassen()
+    bekend = plaatsnamen()
+
+    def opschonen(woonplaats):
+        woonplaats = woonplaats.strip() if isinstance(woonplaats, str) else np.nan
+        woonplaats = aliassen.get(woonplaats, woonplaats)
+        if woonplaats in bekend:
+            return woonplaats
+        naam, score = plaatsnaam_index().zoeken(woonplaats) if drempel and isinstance(woonplaats, str) else (np.nan, 0.0)
+        return naam if drempel and score >= drempel else np.nan
+
+    uitslagen['woonplaats'] = per_waarde(uitslagen.woonplaats, opschonen)
+
+    return uitslagen
@@ -0,0 +1,186 @@
+"""
+Parquet partition store of the results, one file per year with a manifest of the klassementen
+"""
+
+import numpy as np
+import pandas as pd
+import json
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from .meten import geinstrumenteerd
+from .ophalen import BASE_URL, LEGACY, MAX_WORKERS, get_legacy, get_results, get_urls, url_klassement
+from .schema import KLASSEMENTEN, SCHEMA, Uitslag, typeren
+
+
+PARTITIES = Path('data/uitslagen')
+
+
+# column types in the Parquet files
+ARROW_SCHEMA = pa.schema([('startnummer', pa.int32()),
+                          ('naam', pa.string()),
+                          ('woonplaats', pa.string()),
+                          ('nettotijd', pa.string()),
+                          ('jaar', pa.int16()),
+                          ('klassement', pa.dictionary(pa.int8(), pa.string())),
+                          ('afstand', pa.dictionary(pa.int8(), pa.string(), ordered=True)),
+                          ('nettotijd_sec', pa.int32())])
+
+
+def partitie_pad(jaar, directory=PARTITIES):
+    """
+    Returns the path of the Parquet file with the results of one year, e.g. data/uitslagen/jaar=2019.parquet
+    The file holds one row group per klassement code, in the order recorded in the manifest.
+    """
+
+    return Path(directory) / f'jaar={jaar}.parquet'
+
+
+def partities(directory=PARTITIES):
+    """
+    Returns the manifest of the partition store: {jaar: [klassement codes]}
+    A year without a results page for a klassement is recorded without that code, so it is not fetched again.
+    """
+
+    path = Path(directory) / 'partities.json'
+    if not path.is_file():
+        return dict()
+    return {int(jaar): codes for jaar, codes in json.loads(path.read_text()).items()}
+
+
+def schrijven_partities(uitslagen, jaren, directory=PARTITIES):
+    """
+    Writes the results of the given years to the partition store, a Parquet file per year with a row group
+    per klassement, and records them in the manifest
+    """
+
+    manifest = partities(directory)
+    uitslagen = typeren(uitslagen)
+    codes = {v: k for k, v in KLASSEMENTEN.items()}
+    uitslagen['code'] = [codes[(k, a)] for k, a in zip(uitslagen.klassement, uitslagen.afstand)]
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for jaar in jaren:
+        jaar = int(jaar)
+        df = uitslagen[uitslagen.jaar == jaar]
+        manifest[jaar] = [code for code in KLASSEMENTEN if (df.code == code).any()]
+        path = partitie_pad(jaar, directory)
+        if not manifest[jaar]:
+            path.unlink(missing_ok=True)
+            continue
+        tmp = path.with_suffix('.parquet.tmp')
+        with pq.ParquetWriter(tmp, ARROW_SCHEMA) as writer:
+            for code in manifest[jaar]:
+                partitie = df.loc[df.code == code, list(SCHEMA)].astype({'jaar': 'int16'})
+                # one row group, however large: the readers find a klassement by its position in the manifest
+                writer.write_table(pa.Table.from_pandas(partitie, ARROW_SCHEMA, preserve_index=False), row_group_size=len(partitie))
+        assert pq.ParquetFile(tmp).num_row_groups == len(manifest[jaar]), f'{path}: not one row group per klassement'
+        os.replace(tmp, path)
+
+    manifest = dict(sorted(manifest.items()))
+    tmp = Path(directory) / 'partities.json.tmp'
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, Path(directory) / 'partities.json')
+    return manifest
+
+
+def importeren_csv(directory=PARTITIES):
+    """
+    One-time conversion of the CSV datasets into the Parquet partition store:
+    the whole-file datasets data/uitslagen_1999_2002.csv and data/uitslagen_2003_{jaar}.csv,
+    and partitions written as CSV by earlier versions (jaar=2019/h12.csv), which are removed afterwards
+    """
+
+    csv_partities = sorted(Path(directory).glob('jaar=*/*.csv'))
+    if csv_partities or not (Path(directory) / 'partities.json').is_file():
+        paths = csv_partities or [Path('data/uitslagen_1999_2002.csv')] + sorted(Path('data').glob('uitslagen_2003_*.csv'))[-1:]
+        paths = [path for path in paths if path.is_file()]
+        uitslagen = pd.concat([pd.read_csv(path, dtype=str, keep_default_na=False) for path in paths]) if paths else pd.DataFrame(columns=Uitslag._fields)
+        schrijven_partities(uitslagen, uitslagen.jaar.astype(int).unique(), directory)
+        for path in csv_partities:
+            path.unlink()
+            if not any(path.parent.iterdir()):
+                path.parent.rmdir()
+
+
+@geinstrumenteerd
+def lezen_uitslagen(columns=None, jaar=None, afstand=None, klassement=None, codes=None, directory=PARTITIES):
+    """
+    Reads results from the partition store with column and predicate pushdown:
+    only the files and row groups matching jaar, afstand, klassement and klassement codes
+    (each a value or a list, default all) are read, and only the given columns.
+
+    Example
+    =======
+    lezen_uitslagen(['naam', 'nettotijd_sec'], jaar=2019, afstand='21.1 km')
+    """
+
+    def selectie(value):
+        return None if value is None else set([value] if isinstance(value, (str, int)) else value)
+
+    jaren, afstanden, klassementen, codes = map(selectie, [jaar, afstand, klassement, codes])
+    codes = [code for code, (k, a) in KLASSEMENTEN.items()
+             if (codes is None or code in codes) and (klassementen is None or k in klassementen) and (afstanden is None or a in afstanden)]
+    columns = list(SCHEMA) if columns is None else list(columns)
+
+    tables = list()
+    for j, j_codes in partities(directory).items():
+        row_groups = [i for i, code in enumerate(j_codes) if code in codes]
+        if (jaren is None or j in jaren) and row_groups:
+            tables.append(pq.ParquetFile(partitie_pad(j, directory)).read_row_groups(row_groups, columns))
+    if not tables:
+        return pd.DataFrame(columns=columns).astype({column: SCHEMA[column] for column in columns})
+
+    return arrow_naar_pandas(pa.concat_tables(tables))
+
+
+def arrow_naar_pandas(table):
+    """
+    Returns an Arrow table read from the partition store as a DataFrame with the column types of SCHEMA
+    """
+
+    uitslagen = table.to_pandas()
+    uitslagen = uitslagen.astype({column: SCHEMA[column] for column in uitslagen.columns})
+    for column in uitslagen.select_dtypes(object):
+        uitslagen[column] = uitslagen[column].where(uitslagen[column].notna(), np.nan) # None -> NaN
+    return uitslagen
+
+
+@geinstrumenteerd
+def ophalen_partities(jaren, max_workers=MAX_WORKERS, offline=False, directory=PARTITIES, base_url=BASE_URL, legacy=LEGACY):
+    """
+    Fetch the results of the given years and write them to the partition store
+    legacy: specs of the years of the site at base_url that are not in the current layout (get_legacy)
+    """
+
+    urls = [url for jaar in jaren if jaar not in legacy
+            for url in get_urls(jaar, jaar, base_url, max_workers, offline) if url_klassement(url) in KLASSEMENTEN]
+    frames = [get_results(urls, max_workers, offline), get_legacy(jaren, max_workers, offline, base_url, legacy)]
+    return schrijven_partities(pd.concat(frames, sort=False, ignore_index=True), jaren, directory)
+
+
+@geinstrumenteerd
+def ophalen_data(jaar, max_workers=MAX_WORKERS, offline=False, start_jaar=1999, klassementen=None, directory=PARTITIES):
+    """
+    Returns the race results from start_jaar up to and including jaar
+    Only years missing from the partition store are fetched, and only the partitions of the requested years
+    and klassementen (codes as in KLASSEMENTEN, default all) are read.
+    """
+
+    # partition store, initialised from the CSV datasets
+    importeren_csv(directory)
+
+    # ophalen ontbrekende jaren
+    jaren = range(start_jaar, jaar + 1)
+    ontbrekend = [j for j in jaren if j not in partities(directory)]
+    if ontbrekend:
+        ophalen_partities(ontbrekend, max_workers, offline, directory)
+
+    # inlezen ruwe dataset, as strings
+    uitslagen = lezen_uitslagen(Uitslag._fields, jaar=jaren, codes=klassementen, directory=directory)
+    uitslagen['startnummer'] = uitslagen.startnummer.astype(str).where(uitslagen.startnummer.notna(), np.nan)
+    uitslagen = uitslagen.astype({'jaar': int, 'klassement': object, 'afstand': object})
+
+    return uitslagen
@@ -0,0 +1,115 @@
+"""
+Column layout and types of the results: the partition store schema and the compact schema
+"""
+
+import numpy as np
+import pandas as pd
+import functools
+from collections import namedtuple
+
+from .hulp import parse_tijden
+from .meten import geinstrumenteerd
+
+
+# h=heren, d=dames, 12=21.1K, 10=10K en 5=5K
+KLASSEMENTEN = {'h12': ('Herenklassement', '21.1 km'),
+                'd12': ('Damesklassement', '21.1 km'),
+                'h10': ('Herenklassement', '10 km'),
+                'd10': ('Damesklassement', '10 km'),
+                'h5': ('Herenklassement', '5 km'),
+                'd5': ('Damesklassement', '5 km')}
+
+Uitslag = namedtuple('Uitslag', ['startnummer', 'naam', 'woonplaats', 'nettotijd', 'jaar', 'klassement', 'afstand'])
+
+
+ONBEKEND = ['-', '--', 'onbekend', '-- onbekend --']
+
+# column types of the partition store
+SCHEMA = {'startnummer': 'Int32',
+          'naam': 'object',
+          'woonplaats': 'object',
+          'nettotijd': 'object',
+          'jaar': 'category',
+          'klassement': pd.CategoricalDtype(['Damesklassement', 'Herenklassement']),
+          'afstand': pd.CategoricalDtype(['5 km', '10 km', '21.1 km'], ordered=True),
+          'nettotijd_sec': 'Int32'}
+
+
+@geinstrumenteerd
+def typeren(uitslagen):
+    """
+    Returns raw results as scraped (all strings) with the column types of SCHEMA
+    """
+
+    uitslagen = uitslagen[list(Uitslag._fields)].replace(ONBEKEND + [''], np.nan)
+    uitslagen['startnummer'] = pd.to_numeric(uitslagen.startnummer, errors='coerce').astype('Int32')
+    uitslagen['jaar'] = uitslagen.jaar.astype(int)
+    seconden, ongeldig = parse_tijden(uitslagen.nettotijd)
+    uitslagen['nettotijd_sec'] = pd.Series(seconden, index=uitslagen.index).mask(ongeldig)
+    return uitslagen.astype(SCHEMA)
+
+
+try:
+    STRING = pd.StringDtype('pyarrow') # pandas >= 1.3
+except (TypeError, ImportError):
+    STRING = pd.StringDtype()
+
+# column types of compact(): repeated strings as categoricals, names as (Arrow-backed) strings, narrow numbers
+COMPACT = {'startnummer': 'Int32',
+           'naam': STRING,
+           'woonplaats': 'category',
+           'nettotijd': 'category',
+           'jaar': 'int16',
+           'klassement': SCHEMA['klassement'],
+           'afstand': SCHEMA['afstand'],
+           'gemeente': 'category',
+           'tot_ijsselstein': 'float32',
+           'nettotijd_sec': 'Int32',
+           'runner_id': 'Int32'}
+
+
+def compact(uitslagen):
+    """
+    Returns the results with the column types of COMPACT, for the columns present
+    Raises ValueError when a value does not fit its type, e.g. an unknown klassement or a startnummer that is not a number.
+    The functions that clean and enrich the results (compact_behouden) return compact results for compact input.
+    """
+
+    schema = {kolom: dtype for kolom, dtype in COMPACT.items() if kolom in uitslagen and uitslagen[kolom].dtype != dtype}
+    uitslagen = uitslagen.assign(**{kolom: pd.to_numeric(uitslagen[kolom].replace(ONBEKEND + [''], np.nan))
+                                    for kolom in ['startnummer', 'nettotijd_sec', 'runner_id']
+                                    if kolom in schema and not pd.api.types.is_numeric_dtype(uitslagen[kolom])})
+    compacte = uitslagen.astype(schema)
+    compacte.attrs['compact'] = True
+
+    # categories and numbers must not lose values
+    for kolom in schema:
+        verloren = compacte[kolom].isna() & uitslagen[kolom].notna()
+        if verloren.any():
+            raise ValueError(f'{kolom}: {uitslagen.loc[verloren, kolom].iloc[0]!r} does not fit {schema[kolom]}')
+    return compacte
+
+
+def compact_behouden(functie):
+    """
+    Decorator for functions that clean or enrich the results: returns compact results for compact input
+    """
+
+    @functools.wraps(functie)
+    def wrapper(uitslagen, *args, **kwargs):
+        if not uitslagen.attrs.get('compact'):
+            return functie(uitslagen, *args, **kwargs)
+        return compact(functie(uitslagen, *args, **kwargs))
+    return wrapper
+
+
+def geheugen_rapport(voor, na):
+    """
+    Returns the memory use in bytes and the type of each column of two versions of the results, e.g. before and after compact
+    """
+
+    rapport = pd.DataFrame({'dtype_voor': voor.dtypes.astype(str), 'voor': voor.memory_usage(deep=True, index=False),
+                            'dtype_na': na.dtypes.astype(str), 'na': na.memory_usage(deep=True, index=False)})
+    rapport.loc['totaal', ['voor', 'na']] = rapport[['voor', 'na']].sum()
+    rapport['factor'] = rapport.voor / rapport.na
+    return rapport
@@ -0,0 +1,382 @@
+"""
+Enrichment of the results: gemeente and travel distance, runner identity, the aggregate cube and the rank index
+"""
+
+import numpy as np
+import pandas as pd
+import json
+import os
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from .hulp import parse_tijden
+from .meten import geinstrumenteerd
+from .schema import SCHEMA, compact_behouden
+
+
+AFSTANDEN = Path('data/gemeente_afstanden.csv')
+
+
+def afstanden_bron(gpkg, referentie):
+    """
+    Returns what the distance table is built from: the path, modification time and size of the GeoPackage and the
+    reference gemeente, None when the GeoPackage does not exist
+    """
+
+    if not Path(gpkg).is_file():
+        return None
+    stat = Path(gpkg).stat()
+    return {'gpkg': str(gpkg), 'mtime_ns': stat.st_mtime_ns, 'grootte': stat.st_size, 'referentie': referentie}
+
+
+@geinstrumenteerd
+def gemeente_afstanden(path=AFSTANDEN, gpkg='data/2019_gemeentegrenzen_kustlijn.gpkg', cache='data/cache/kaart', referentie='IJsselstein'):
+    """
+    Returns the distance in kilometers from the centre of each municipality to the centre of referentie:
+    a table gemeente -> tot_ijsselstein, built from the municipality borders and stored in data/gemeente_afstanden.csv,
+    with what it was built from (afstanden_bron) in data/gemeente_afstanden.json. The table is built again when the
+    GeoPackage or referentie changed; without the GeoPackage the stored table is used.
+    The centroids come from the geometry cache (kaarten), at the coarsest resolution: they are those of the full geometries.
+    """
+
+    bron = afstanden_bron(gpkg, referentie)
+    bron_path = Path(path).with_suffix('.json')
+    if not Path(path).is_file() or (bron is not None and (not bron_path.is_file() or json.loads(bron_path.read_text()) != bron)):
+        from .kaarten import RESOLUTIES, kaart # only needed to build the table, importing geopandas takes long
+
+        # past the in-process cache of kaart, which does not notice a changed GeoPackage
+        gemeenten = kaart.__wrapped__(max(RESOLUTIES, key=RESOLUTIES.get), gpkg, cache)
+        centrum = gemeenten[gemeenten.gemeentenaam == referentie].iloc[0]
+        afstand = np.hypot(gemeenten.centroid_x - centrum.centroid_x, gemeenten.centroid_y - centrum.centroid_y)
+        afstanden = pd.DataFrame({'gemeente': gemeenten.gemeentenaam,
+                                  'tot_ijsselstein': afstand.apply(lambda x: round(x / 1000, 2))}) # distance in km
+        tmp = Path(path).with_suffix('.csv.tmp')
+        afstanden.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+        tmp = bron_path.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(afstanden_bron(gpkg, referentie), indent=1))
+        os.replace(tmp, bron_path)
+
+    return pd.read_csv(path)
+
+
+@geinstrumenteerd
+@compact_behouden
+def gemeenten(uitslagen, afstanden=None):
+    """
+    Toevoegen gemeenten incl. afstand tot het centrum van de gemeente IJsselstein in kilometers
+    afstanden: table gemeente -> tot_ijsselstein, defaults to gemeente_afstanden()
+    """
+
+    # rows with woonplaats is NA
+    uitslagen_wpl_na = uitslagen[uitslagen.woonplaats.isna()].copy()
+
+    # add municipality data
+    uitslagen = pd.merge(uitslagen, pd.read_csv('data/plaatsnaam_gemeente.csv'), how='left', left_on='woonplaats', right_on='plaatsnaam')
+    uitslagen.drop('plaatsnaam', axis=1, inplace=True)
+
+    # add distance to IJsselstein
+    afstanden = gemeente_afstanden() if afstanden is None else afstanden
+    uitslagen = pd.merge(uitslagen, afstanden[['gemeente', 'tot_ijsselstein']], how='inner', on='gemeente')
+
+    # select municipality nearest to IJsselstein (first row with the minimum distance per startnummer and race, as idxmin)
+    sleutel = ['startnummer', 'jaar', 'afstand', 'klassement']
+    uitslagen = uitslagen.dropna(subset=sleutel).sort_values(by='tot_ijsselstein', kind='mergesort').drop_duplicates(sleutel)
+    uitslagen = uitslagen.sort_values(by=['jaar', 'klassement', 'afstand', 'tot_ijsselstein'])
+
+    # add rows with woonplaats is NA
+    uitslagen_wpl_na['tot_ijsselstein'] = np.nan
+    uitslagen_wpl_na['gemeente'] = np.nan
+    uitslagen = pd.concat([uitslagen, uitslagen_wpl_na], sort=False).sort_values(by=['jaar', 'afstand', 'klassement'])
+
+    # set dtypes
+    uitslagen['jaar'] = uitslagen.jaar.astype(int)
+
+    # reset index
+    uitslagen.reset_index(drop=True, inplace=True)
+
+    return uitslagen
+
+
+TUSSENVOEGSELS = {'van', 'de', 'der', 'den', 'het', 't', 'ter', 'ten', 'te', 'in', 'op', 'v', 'd', 'vd', 'v.d.', 'van der', 'van den'}
+
+
+def naam_sleutel(naam):
+    """
+    Returns the normalized name used to compare runners: lowercase without accents and punctuation,
+    tussenvoegsels removed and the remaining parts sorted, e.g. 'Woerden, Frans van' -> 'frans woerden'
+    """
+
+    if not isinstance(naam, str):
+        return ''
+    naam = unicodedata.normalize('NFKD', naam).encode('ascii', 'ignore').decode().lower()
+    delen = ''.join(c if c.isalnum() else ' ' for c in naam).split()
+    return ' '.join(sorted([deel for deel in delen if deel not in TUSSENVOEGSELS] or delen))
+
+
+@geinstrumenteerd
+@compact_behouden
+def lopers(uitslagen, drempel=0.85, tijd_factor=1.3):
+    """
+    Adds a runner_id that links the results of the same runner over the years.
+    Results with the same normalized name (naam_sleutel) and klassement are one runner, unless the name ran the same
+    race (jaar and afstand) more than once: then its results are split into runners, each result joining the first
+    whose other results pass the checks below (another year, a shared woonplaats, a time within tijd_factor).
+    Names that differ are compared only within blocks on the first and last part of the sorted naam_sleutel: names
+    sharing the last part and the initial of the first, or the first part and the initial of the last. As the parts
+    are sorted alphabetically, these are not necessarily the first and last name. Names are linked when the
+    similarity is at least drempel, the runners never ran the same year, their median times on a common afstand
+    differ less than tijd_factor and, when both have a known woonplaats, they share one (or the similarity is at
+    least 0.95). Linked names are merged with union-find.
+    """
+
+    sleutels, namen = pd.factorize(pd.Series([naam_sleutel(naam) for naam in uitslagen.naam.drop_duplicates()],
+                                             index=uitslagen.naam.drop_duplicates()).reindex(uitslagen.naam).to_numpy())
+    tijden = parse_tijden(uitslagen.nettotijd.str.replace('.', ':', regex=False))
+    rijen = pd.DataFrame({'sleutel': sleutels, 'klassement': uitslagen.klassement.to_numpy(), 'jaar': uitslagen.jaar.to_numpy(),
+                          'afstand': uitslagen.afstand.to_numpy(), 'woonplaats': uitslagen.woonplaats.to_numpy(),
+                          'tijd': np.where(tijden[1], np.nan, tijden[0])})
+
+    # names that ran the same race more than once: split into parts, in order of jaar
+    rijen['deel'] = 0
+    dubbel = rijen.duplicated(['sleutel', 'klassement', 'jaar', 'afstand'], keep=False) & (namen[sleutels] != '')
+    dubbel = rijen.set_index(['sleutel', 'klassement']).index.isin(rijen[dubbel].set_index(['sleutel', 'klassement']).index)
+    for _, groep in rijen[dubbel].sort_values('jaar', kind='mergesort').groupby(['sleutel', 'klassement'], observed=True, sort=False):
+        delen = list() # per part: jaren, woonplaatsen and {afstand: tijden}
+        for i, rij in zip(groep.index, groep.itertuples()):
+            for d, (d_jaren, d_woonplaatsen, d_tijden) in enumerate(delen):
+                tijd = np.median(d_tijden[rij.afstand]) if d_tijden.get(rij.afstand) and not np.isnan(rij.tijd) else None
+                if (rij.jaar not in d_jaren and (not isinstance(rij.woonplaats, str) or not d_woonplaatsen or rij.woonplaats in d_woonplaatsen)
+                        and (tijd is None or max(tijd, rij.tijd) <= tijd_factor * min(tijd, rij.tijd))):
+                    break
+            else:
+                d = len(delen)
+                delen.append((set(), set(), defaultdict(list)))
+            delen[d][0].add(rij.jaar)
+            if isinstance(rij.woonplaats, str):
+                delen[d][1].add(rij.woonplaats)
+            if not np.isnan(rij.tijd):
+                delen[d][2][rij.afstand].append(rij.tijd)
+            rijen.loc[i, 'deel'] = d
+
+    profielen, profiel = pd.factorize(pd.Series(list(zip(rijen.sleutel, rijen.klassement, rijen.deel))))
+    rijen['profiel'] = profielen
+    jaren = rijen.groupby('profiel').jaar.agg(set).tolist()
+    woonplaatsen = rijen.dropna(subset=['woonplaats']).groupby('profiel').woonplaats.agg(set).to_dict()
+    mediaan = defaultdict(dict)
+    for (p, afstand), tijd in rijen.groupby(['profiel', 'afstand'], observed=True).tijd.median().dropna().items():
+        mediaan[p][afstand] = tijd
+
+    # blocking index
+    blokken = defaultdict(list)
+    for p, (sleutel, klassement, _) in enumerate(profiel):
+        delen = namen[sleutel].split()
+        if len(delen) > 1:
+            blokken[(klassement, delen[-1], delen[0][0])].append(p)
+            blokken[(klassement, delen[0], delen[-1][0])].append(p)
+
+    ouder = list(range(len(profiel)))
+    def wortel(p):
+        while ouder[p] != p:
+            ouder[p] = ouder[ouder[p]]
+            p = ouder[p]
+        return p
+
+    for blok in blokken.values():
+        for i, a in enumerate(blok):
+            for b in blok[i + 1:]:
+                # parts of a split name were already compared when splitting
+                if wortel(a) == wortel(b) or jaren[a] & jaren[b] or profiel[a][:2] == profiel[b][:2]:
+                    continue
+                score = SequenceMatcher(None, namen[profiel[a][0]], namen[profiel[b][0]]).ratio()
+                if score < drempel:
+                    continue
+                gemeenschappelijk = set(mediaan[a]) & set(mediaan[b])
+                if any(max(mediaan[a][x], mediaan[b][x]) > tijd_factor * min(mediaan[a][x], mediaan[b][x]) for x in gemeenschappelijk):
+                    continue
+                if a in woonplaatsen and b in woonplaatsen and not woonplaatsen[a] & woonplaatsen[b] and score < 0.95:
+                    continue
+                # union on the current members: a cluster's years are the union of its profiles' years
+                ra, rb = wortel(a), wortel(b)
+                if jaren[ra] & jaren[rb]:
+                    continue
+                ouder[rb] = ra
+                jaren[ra] = jaren[ra] | jaren[rb]
+
+    # results without a name are not linked
+    runner_id = pd.factorize(np.array([wortel(p) for p in range(len(profiel))])[profielen])[0]
+    uitslagen['runner_id'] = pd.array(runner_id, dtype='Int64')
+    uitslagen.loc[namen[sleutels] == '', 'runner_id'] = pd.NA
+
+    return uitslagen
+
+
+def persoonlijke_records(uitslagen):
+    """
+    Returns the fastest result of each runner per afstand: runner_id, afstand, naam, jaar, nettotijd
+    uitslagen: results with runner_id (lopers) and nettotijd_sec
+    """
+
+    records = uitslagen.dropna(subset=['nettotijd_sec']).sort_values(['nettotijd_sec', 'jaar'], kind='mergesort')
+    records = records.drop_duplicates(['runner_id', 'afstand']).sort_values(['runner_id', 'afstand'])
+    return records[['runner_id', 'afstand', 'naam', 'jaar', 'nettotijd']].reset_index(drop=True)
+
+
+def deelnames(uitslagen, runner_id):
+    """
+    Returns the participation history of a runner, sorted by jaar
+    uitslagen: results with runner_id (lopers)
+    """
+
+    return uitslagen[uitslagen.runner_id == runner_id].sort_values(['jaar', 'afstand']).reset_index(drop=True)
+
+
+KUBUS = Path('data/kubus.parquet')
+KUBUS_DIMENSIES = ['jaar', 'afstand', 'klassement', 'gemeente']
+KWANTIELEN = {'nettotijd_q10': 0.1, 'nettotijd_q25': 0.25, 'nettotijd_mediaan': 0.5, 'nettotijd_q75': 0.75, 'nettotijd_q90': 0.9}
+
+
+def kubus_berekenen(uitslagen):
+    """
+    Returns the aggregate cube of the results: per (jaar, afstand, klassement, gemeente) cell the number of
+    participants (aantal), the number with a time (getijd), the fastest time, the quantiles of nettotijd_sec and
+    the distance of the gemeente to IJsselstein. Results without a gemeente form a cell with gemeente NaN.
+    uitslagen: results with gemeente, tot_ijsselstein (gemeenten) and nettotijd_sec
+    """
+
+    df = uitslagen[KUBUS_DIMENSIES + ['nettotijd_sec', 'tot_ijsselstein']].astype({'nettotijd_sec': float, 'jaar': int, 'gemeente': object})
+    df['gemeente'] = df.gemeente.fillna('') # group key for the results without a gemeente
+    groepen = df.groupby(KUBUS_DIMENSIES, observed=True, sort=True)
+    kubus = groepen.agg(aantal=('nettotijd_sec', 'size'), getijd=('nettotijd_sec', 'count'),
+                        nettotijd_min=('nettotijd_sec', 'min'), tot_ijsselstein=('tot_ijsselstein', 'first'))
+    kwantielen = groepen.nettotijd_sec.quantile(list(KWANTIELEN.values())).unstack()
+    kwantielen.columns = list(KWANTIELEN)
+    kubus = kubus.join(kwantielen).reset_index()
+    kubus['gemeente'] = kubus.gemeente.replace('', np.nan)
+    return kubus.astype({'afstand': SCHEMA['afstand'], 'klassement': SCHEMA['klassement']})
+
+
+def lezen_kubus(path=KUBUS):
+    """
+    Returns the stored aggregate cube, an empty cube if there is none
+    """
+
+    if not Path(path).is_file():
+        return pd.DataFrame(columns=KUBUS_DIMENSIES + ['aantal', 'getijd', 'nettotijd_min', 'tot_ijsselstein'] + list(KWANTIELEN))
+    return pd.read_parquet(path).astype({'afstand': SCHEMA['afstand'], 'klassement': SCHEMA['klassement']})
+
+
+@geinstrumenteerd
+def kubus_bijwerken(uitslagen, jaren=None, path=KUBUS):
+    """
+    Updates the stored aggregate cube with the cells of the given years, by default the years of uitslagen that
+    are not in the cube yet, and returns it. Only the results of those years are aggregated.
+    """
+
+    kubus = lezen_kubus(path)
+    jaren = set(uitslagen.jaar.unique()) - set(kubus.jaar) if jaren is None else set(jaren)
+    if not jaren:
+        return kubus
+
+    nieuw = kubus_berekenen(uitslagen[uitslagen.jaar.isin(jaren)])
+    kubus = pd.concat([kubus[~kubus.jaar.isin(jaren)], nieuw], ignore_index=True)
+    kubus = kubus.astype({'jaar': int, 'aantal': int, 'getijd': int, 'afstand': SCHEMA['afstand'], 'klassement': SCHEMA['klassement']})
+    kubus = kubus.sort_values(KUBUS_DIMENSIES, na_position='last').reset_index(drop=True)
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(path).with_suffix('.parquet.tmp')
+    kubus.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return kubus
+
+
+def kubus_opvragen(kubus, per, **filters):
+    """
+    Returns the cube rolled up to the dimensions in per, after selecting the cells equal to the filters:
+    aantal, getijd, fastest time and the mean and maximum distance of the participants with a known gemeente.
+    Quantiles do not roll up and are only returned when per holds all dimensions.
+
+    Example
+    =======
+    kubus_opvragen(lezen_kubus(), ['gemeente', 'afstand'], jaar=2019)  # fastest time per gemeente and distance
+    """
+
+    for dimensie, waarde in filters.items():
+        kubus = kubus[kubus[dimensie] == waarde]
+    if set(per) == set(KUBUS_DIMENSIES):
+        return kubus.reset_index(drop=True)
+
+    kubus = kubus.assign(afstand_totaal=kubus.tot_ijsselstein * kubus.aantal,
+                         aantal_gemeente=kubus.aantal.where(kubus.tot_ijsselstein.notna(), 0))
+    groepen = kubus.groupby(per, observed=True, dropna=False)
+    resultaat = groepen.agg(aantal=('aantal', 'sum'), getijd=('getijd', 'sum'), nettotijd_min=('nettotijd_min', 'min'),
+                            tot_ijsselstein_max=('tot_ijsselstein', 'max'))
+    resultaat.insert(3, 'tot_ijsselstein_gemiddeld', groepen.afstand_totaal.sum() / groepen.aantal_gemeente.sum().replace(0, np.nan))
+    return resultaat.reset_index()
+
+
+class RangIndex:
+    """
+    Sorted finish times of every race (jaar, afstand, klassement) for bulk rank, percentile and time-gap lookups
+    All races are stored in one sorted array of keys race * SCHAAL + nettotijd_sec, so the queries for any number
+    of times in any number of races are answered by a single binary search. Results without a valid time (DNF, NaN)
+    count as participants but not as finishers.
+    """
+
+    SCHAAL = 2 ** 20 # larger than any time in seconds
+
+    def __init__(self, uitslagen):
+        groepen = uitslagen.groupby(['jaar', 'afstand', 'klassement'], observed=True, sort=True)
+        races = groepen.ngroup().to_numpy()
+        self.races = groepen.size().reset_index(name='deelnemers')
+        tijden = pd.to_numeric(uitslagen.nettotijd_sec, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        finish = ~np.isnan(tijden)
+        self.sleutels = np.sort(races[finish].astype(np.int64) * self.SCHAAL + tijden[finish].astype(np.int64))
+        self.races['finishers'] = np.bincount(races[finish], minlength=len(self.races))
+        self.start = np.concatenate([[0], np.cumsum(self.races.finishers)[:-1]])
+
+    def opvragen(self, tijden, jaar=None, afstand=None, klassement=None):
+        """
+        Returns for each time in tijden (seconds or 'HH:MM:SS') and each selected race: the rank the time would have
+        had (finishers with the same time share the rank), the number of finishers with exactly that time, the
+        percentile (percentage of finishers at least as fast, so lower is better), the gap to the winner and to the
+        finisher just ahead
+
+        Example
+        =======
+        RangIndex(uitslagen).opvragen(['00:48:30'], afstand='10 km', klassement='Damesklassement')
+        """
+
+        tijden = pd.Series(tijden)
+        if tijden.dtype == object:
+            seconden, ongeldig = parse_tijden(tijden.str.replace('.', ':', regex=False))
+            tijden = pd.Series(np.where(ongeldig, np.nan, seconden))
+        tijden = tijden.to_numpy(dtype=float)
+
+        selectie = np.ones(len(self.races), dtype=bool)
+        for kolom, waarde in [('jaar', jaar), ('afstand', afstand), ('klassement', klassement)]:
+            if waarde is not None:
+                selectie &= self.races[kolom].isin(np.atleast_1d(waarde)).to_numpy()
+        races = np.flatnonzero(selectie & (self.races.finishers > 0).to_numpy())
+
+        race = np.repeat(races, len(tijden))
+        tijd = np.tile(tijden, len(races))
+        sleutels = race * self.SCHAAL + np.nan_to_num(tijd).astype(np.int64)
+        sneller = np.searchsorted(self.sleutels, sleutels, side='left') - self.start[race]
+        gelijk = np.searchsorted(self.sleutels, sleutels, side='right') - self.start[race] - sneller
+        finishers = self.races.finishers.to_numpy()[race]
+
+        winnaar = self.sleutels[self.start[race]] - race * self.SCHAAL
+        voorganger = self.sleutels[self.start[race] + np.maximum(sneller - 1, 0)] - race * self.SCHAAL
+
+        resultaat = self.races.iloc[race][['jaar', 'afstand', 'klassement', 'finishers']].reset_index(drop=True)
+        resultaat['tijd'] = tijd
+        resultaat['rang'] = sneller + 1
+        resultaat['gelijk'] = gelijk
+        resultaat['percentiel'] = 100 * (sneller + gelijk) / finishers
+        resultaat['achterstand'] = tijd - winnaar
+        resultaat['gat'] = np.where(sneller > 0, tijd - voorganger, np.nan)
+        resultaat.loc[np.isnan(tijd), ['rang', 'gelijk', 'percentiel']] = np.nan
+        return resultaat
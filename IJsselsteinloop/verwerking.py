@@ -0,0 +1,186 @@
+"""
+The cached pipeline from the partition store to the cleaned and enriched results
+"""
+
+import pandas as pd
+import hashlib
+import inspect
+import json
+import logging
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from .meten import geinstrumenteerd
+from .opschonen import ALIASSEN, namen, nettotijd, nettotijd_sec, woonplaatsen
+from .opslag import PARTITIES, ophalen_data, partitie_pad, partities
+from .verrijken import AFSTANDEN, gemeente_afstanden, gemeenten, lopers
+
+
+logger = logging.getLogger(__name__)
+
+
+PIPELINE_CACHE = Path('data/cache/pipeline')
+
+# stage of the pipeline: function, names of the stages whose output is its input, and an optional function
+# returning a fingerprint of the files it reads for the given parameters (None when they are incomplete)
+Stage = namedtuple('Stage', ['functie', 'invoer', 'vingerafdruk'])
+
+
+def bestanden_vingerafdruk(*paths):
+    """
+    Returns the content hash of files, None if one of them does not exist
+    """
+
+    h = hashlib.sha1()
+    for path in paths:
+        if not Path(path).is_file():
+            return None
+        h.update(str(path).encode())
+        h.update(Path(path).read_bytes())
+    return h.hexdigest()
+
+
+def partities_vingerafdruk(parameters):
+    """
+    Returns the content hash of the partitions read by ophalen_data, None if a year is missing from the store
+    """
+
+    directory = parameters.get('directory', PARTITIES)
+    manifest = partities(directory)
+    jaren = range(parameters.get('start_jaar', 1999), parameters['jaar'] + 1)
+    if any(jaar not in manifest for jaar in jaren):
+        return None
+    return bestanden_vingerafdruk(*[partitie_pad(jaar, directory) for jaar in jaren if manifest[jaar]])
+
+
+def afstanden_vingerafdruk(parameters):
+    """
+    Returns the content hash of the distance table and plaatsnaam_gemeente.csv, the table built again first when the
+    GeoPackage changed (gemeente_afstanden)
+    """
+
+    gemeente_afstanden()
+    return bestanden_vingerafdruk(AFSTANDEN, 'data/plaatsnaam_gemeente.csv')
+
+
+STAGES = {'ophalen_data': Stage(ophalen_data, [], partities_vingerafdruk),
+          'namen': Stage(namen, ['ophalen_data'], None),
+          'woonplaatsen': Stage(woonplaatsen, ['namen'], lambda parameters: bestanden_vingerafdruk(ALIASSEN, 'data/plaatsnaam_gemeente.csv')),
+          'nettotijd': Stage(nettotijd, ['woonplaatsen'], None),
+          'gemeenten': Stage(gemeenten, ['nettotijd'], afstanden_vingerafdruk),
+          'nettotijd_sec': Stage(nettotijd_sec, ['gemeenten'], None),
+          'lopers': Stage(lopers, ['nettotijd_sec'], None)}
+
+
+def stabiele_repr(waarde):
+    """
+    Returns a repr of a constant that is the same in every process: sets and dictionaries sorted, objects other than
+    constants (e.g. response_cache, whose repr has its address) by their type name only
+    """
+
+    if isinstance(waarde, (str, bytes, int, float, bool, type(None), Path)):
+        return repr(waarde)
+    if isinstance(waarde, (set, frozenset)):
+        return '{' + ', '.join(sorted(map(stabiele_repr, waarde))) + '}'
+    if isinstance(waarde, (tuple, list)):
+        return '(' + ', '.join(map(stabiele_repr, waarde)) + ')'
+    if isinstance(waarde, dict):
+        return '{' + ', '.join(sorted(f'{stabiele_repr(k)}: {stabiele_repr(v)}' for k, v in waarde.items())) + '}'
+    return f'<{type(waarde).__module__}.{type(waarde).__qualname__}>'
+
+
+def code_versie(functie, gezien=None):
+    """
+    Returns the source code of a function together with the package functions, classes and constants it uses, recursively;
+    constants as stabiele_repr, so the version is the same in every process
+    """
+
+    gezien = set() if gezien is None else gezien
+    functie = inspect.unwrap(functie)
+    try:
+        bron = [inspect.getsource(functie)]
+    except (OSError, TypeError):
+        # generated classes such as namedtuples have no source
+        bron = [repr(getattr(functie, '_fields', functie))]
+    code = [functie.__code__] if hasattr(functie, '__code__') else []
+    globalen = getattr(functie, '__globals__', dict())
+    while code:
+        c = code.pop()
+        code.extend(const for const in c.co_consts if inspect.iscode(const))
+        for naam in c.co_names:
+            waarde = globalen.get(naam)
+            if naam in gezien or waarde is None or inspect.ismodule(waarde):
+                continue
+            gezien.add(naam)
+            if callable(waarde) and str(getattr(inspect.unwrap(waarde), '__module__', '')).split('.')[0] == __package__:
+                bron.append(code_versie(waarde, gezien))
+            elif not callable(waarde):
+                bron.append(f'{naam} = {stabiele_repr(waarde)}')
+    return '\n'.join(bron)
+
+
+@geinstrumenteerd
+def pipeline(doel, parameters=None, stages=STAGES, cache=PIPELINE_CACHE):
+    """
+    Returns the output of stage doel, running the stages it depends on only when their output is not cached.
+    The output of each stage is stored in the cache directory under a key that hashes the stage's code version,
+    its parameters, the fingerprint of the files it reads and the keys of its input stages, so a change in the data,
+    the alias table or the code re-runs only the stages downstream of the change. Every key keeps its own entry,
+    {stage}-{code version}-{key}.pkl, so runs with other parameters (e.g. another jaar) reuse theirs; only the
+    entries of a previous code version of the stage are removed.
+    parameters: dictionary {stage: {parameter: value}}
+
+    Example
+    =======
+    pipeline('nettotijd_sec', {'ophalen_data': {'jaar': 2019}})
+    """
+
+    parameters = dict() if parameters is None else parameters
+    sleutels = dict()
+    versies = {naam: hashlib.sha1(code_versie(stage.functie).encode()).hexdigest()[:12] for naam, stage in stages.items()}
+
+    def sleutel(naam):
+        if naam not in sleutels:
+            stage = stages[naam]
+            invoer = [sleutel(i) for i in stage.invoer]
+            vingerafdruk = stage.vingerafdruk(parameters.get(naam, dict())) if stage.vingerafdruk else ''
+            if None in invoer or vingerafdruk is None:
+                return None
+            h = hashlib.sha1('\n'.join([naam, versies[naam], json.dumps(parameters.get(naam, dict()), sort_keys=True, default=str), vingerafdruk] + invoer).encode())
+            sleutels[naam] = h.hexdigest()
+        return sleutels[naam]
+
+    def uitvoer(naam):
+        stage = stages[naam]
+        path = Path(cache) / f'{naam}-{versies[naam]}-{sleutel(naam)}.pkl'
+        if sleutel(naam) is not None and path.is_file():
+            logger.info('stage %s: cached', naam)
+            return pd.read_pickle(path)
+
+        invoer = [uitvoer(i) for i in stage.invoer]
+        logger.info('stage %s: running', naam)
+        df = stage.functie(*invoer, **parameters.get(naam, dict()))
+
+        # store under the key after running, the first stage may have fetched missing data
+        if sleutel(naam) is not None:
+            path = Path(cache) / f'{naam}-{versies[naam]}-{sleutel(naam)}.pkl'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f'{path.stem}.{os.getpid()}.tmp') # a concurrent run never reads a partial file
+            df.to_pickle(tmp)
+            os.replace(tmp, path)
+            for oud in path.parent.glob(f'{naam}-*.pkl'):
+                if not oud.name.startswith(f'{naam}-{versies[naam]}-'):
+                    oud.unlink(missing_ok=True) # a concurrent run may have removed it
+        return df
+
+    return uitvoer(doel)
+
+
+def verwerken(jaar, drempel=None, cache=PIPELINE_CACHE):
+    """
+    Returns the cleaned and enriched results up to and including jaar: ophalen_data, namen, woonplaatsen, nettotijd,
+    gemeenten, nettotijd_sec and lopers, with each stage's output cached on disk
+    """
+
+    return pipeline('lopers', {'ophalen_data': {'jaar': jaar}, 'woonplaatsen': {'drempel': drempel}}, cache=cache)
@@ -0,0 +1,385 @@
+"""
+Benchmarks for IJsselsteinloop, run with: python benchmark_IJsselsteinloop.py [suite|vergelijken|kaart]
+
+suite: times and memory-profiles each pipeline stage on synthetic data at 1x, 10x and 100x the size of
+data/uitslagen_2003_2019.csv and compares against the baselines in benchmark_baseline.json, runs offline
+vergelijken: compares the current implementations against the ones they replaced on the stored results
+kaart: load and draw time of the gemeente map at each resolution of the geometry cache
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import IJsselsteinloop
+
+
+URL = IJsselsteinloop.BASE_URL + 'uitslag/2019/uitslag2019h10.htm'
+
+
+def results_page(n, seed=0):
+    """
+    Returns a results page with n rows of [plaats, startnummer, naam, woonplaats, categorie, nettotijd]
+    """
+
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(1800, 5400, n))
+    rows = ''.join(f'<tr><td>{i + 1}</td><td>{1000 + i}</td><td>Loper {i}</td><td>IJsselstein</td><td>H</td>'
+                   f'<td>{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}</td></tr>' for i, s in enumerate(seconds))
+    return f'<html><body><table><tr><td>Plaats</td></tr>{rows}</table></body></html>'.encode()
+
+
+def legacy_get_results(content):
+    """
+    Parser as used by get_results before the lxml parser: BeautifulSoup tree and a DataFrame append per row
+    """
+
+    warnings.simplefilter('ignore', FutureWarning)
+    df = pd.DataFrame()
+    for table_row in BeautifulSoup(content, 'lxml').find('table').find_all('tr')[1:]:
+        variables = table_row.find_all('td')
+        row = pd.Series([variables[col].text for col in [1, 2, 3, 5]])
+        df = df.append(row, ignore_index=True) if hasattr(df, 'append') else pd.concat([df, row.to_frame().T], ignore_index=True)
+    df.columns = ['startnummer', 'naam', 'woonplaats', 'nettotijd']
+    return df
+
+
+def timeit(func, *args, repeat=3):
+    """
+    Returns the best wall time in seconds of repeat calls
+    """
+
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_parse_results(sizes=(1000, 5000)):
+    """
+    Parse time per 1,000 rows: legacy BeautifulSoup/append parser vs. parse_results
+    """
+
+    print('parse_results (ms per 1,000 rows)')
+    for n in sizes:
+        content = results_page(n)
+        legacy = timeit(legacy_get_results, content, repeat=1)
+        lxml = timeit(lambda c: pd.DataFrame.from_records(list(IJsselsteinloop.parse_results(c, URL))), content)
+        print(f'  {n:>7} rows  legacy {legacy / n * 1e6:8.1f}  lxml {lxml / n * 1e6:8.1f}  ({legacy / lxml:.0f}x)')
+
+
+def benchmark_opslag(jaar=2019):
+    """
+    Load time of the results dataset: whole-file CSVs vs. the Parquet partition store
+    """
+
+    onbekend = ['-', '--', 'onbekend', '-- onbekend --']
+    IJsselsteinloop.importeren_csv()
+    def lezen_csv():
+        return pd.concat([pd.read_csv(path, dtype={'startnummer': 'str'}, na_values=onbekend)
+                          for path in ['data/uitslagen_1999_2002.csv', f'data/uitslagen_2003_{jaar}.csv']])
+
+    csv = timeit(lezen_csv)
+    csv_getypeerd = timeit(lambda: IJsselsteinloop.typeren(lezen_csv()), repeat=1)
+    parquet = timeit(IJsselsteinloop.lezen_uitslagen)
+    selectie = timeit(lambda: IJsselsteinloop.lezen_uitslagen(['naam', 'nettotijd_sec'], jaar=jaar, afstand='21.1 km'))
+    print('laden uitslagen (ms)')
+    print(f'  csv (object) {csv * 1000:8.1f}  csv + schema {csv_getypeerd * 1000:8.1f}  '
+          f'parquet {parquet * 1000:8.1f}  parquet {jaar} 21.1 km {selectie * 1000:8.1f}')
+
+
+def legacy_woonplaatsen(uitslagen):
+    """
+    woonplaatsen as before the alias table: one full-frame isin pass per rule
+    """
+
+    uitslagen['woonplaats'] = uitslagen.woonplaats.str.strip()
+    for regel in json.loads(IJsselsteinloop.ALIASSEN.read_text(encoding='utf-8'))['aliassen']:
+        uitslagen.loc[uitslagen.woonplaats.isin(regel['aliassen']), ['woonplaats']] = regel['woonplaats']
+    uitvallijst = set(uitslagen.woonplaats) - set(pd.read_csv('data/plaatsnaam_gemeente.csv').plaatsnaam)
+    uitslagen.loc[uitslagen.woonplaats.isin(uitvallijst), ['woonplaats']] = np.nan
+    return uitslagen
+
+
+def benchmark_woonplaatsen(schalen=(1, 10, 100)):
+    """
+    woonplaatsen on the 1999-2019 results repeated 1x, 10x and 100x: one pass per rule vs. the compiled alias table
+    """
+
+    uitslagen = IJsselsteinloop.ophalen_data(2019)
+    IJsselsteinloop.woonplaatsen(uitslagen.head().copy()) # load alias table and place names
+    print('woonplaatsen (ms)')
+    for schaal in schalen:
+        df = pd.concat([uitslagen] * schaal, ignore_index=True)
+        legacy = timeit(lambda: legacy_woonplaatsen(df.copy()), repeat=1)
+        alias = timeit(lambda: IJsselsteinloop.woonplaatsen(df.copy()))
+        print(f'  {len(df):>9} rows  legacy {legacy * 1000:8.1f}  alias table {alias * 1000:8.1f}  ({legacy / alias:.0f}x)')
+
+
+def benchmark_plaatsnaam_index():
+    """
+    Lookup time per unknown woonplaats: trigram index vs. brute-force similarity against every known place name
+    """
+
+    index = IJsselsteinloop.plaatsnaam_index()
+    onbekend = IJsselsteinloop.voorstellen_woonplaatsen(IJsselsteinloop.ophalen_data(2019), drempel=0).woonplaats
+    brute_force = timeit(lambda: [max(index.namen, key=lambda naam: SequenceMatcher(None, w.lower(), naam.lower()).ratio()) for w in onbekend], repeat=1)
+    trigram = timeit(lambda: [index.zoeken(w) for w in onbekend])
+    print(f'plaatsnaam_index ({len(index.namen)} names, ms per lookup)')
+    print(f'  brute force {brute_force / len(onbekend) * 1000:8.3f}  trigram index {trigram / len(onbekend) * 1000:8.3f}')
+
+
+def benchmark_parse_tijden():
+    """
+    Time parsing of nettotijd on the 1999-2019 results: time_to_seconds per row vs. parse_tijden
+    """
+
+    tijden = IJsselsteinloop.ophalen_data(2019).nettotijd
+    apply = timeit(lambda: tijden.str.replace('.', ':', regex=False).apply(IJsselsteinloop.time_to_seconds))
+    vectorized = timeit(lambda: IJsselsteinloop.parse_tijden(tijden))
+    print(f'parse_tijden ({len(tijden)} rows, ms)')
+    print(f'  apply {apply * 1000:8.1f}  parse_tijden {vectorized * 1000:8.1f}  ({apply / vectorized:.0f}x)')
+
+
+def synthetische_kaart(path, n=19, punten=500, grootte=10000, seed=0):
+    """
+    Writes a GeoPackage with an n x n grid of gemeenten of grootte metres, the middle one IJsselstein, whose borders are
+    wavy lines of punten vertices shared by the neighbours, about as detailed as the real municipality borders
+    """
+
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, punten)[1:-1]
+    k = np.arange(1, 41)
+
+    def rand():
+        return grootte / 60 * np.sin(np.pi * t) * (np.sin(2 * np.pi * np.outer(t, k) + rng.uniform(0, 2 * np.pi, len(k))) / k).sum(axis=1)
+
+    h = {(i, j): np.column_stack([(i + t) * grootte, j * grootte + rand()]) for i in range(n) for j in range(n + 1)}
+    v = {(i, j): np.column_stack([i * grootte + rand(), (j + t) * grootte]) for i in range(n + 1) for j in range(n)}
+    polygonen = [Polygon(np.vstack([[(i * grootte, j * grootte)], h[i, j], [((i + 1) * grootte, j * grootte)], v[i + 1, j],
+                                    [((i + 1) * grootte, (j + 1) * grootte)], h[i, j + 1][::-1], [(i * grootte, (j + 1) * grootte)], v[i, j][::-1]]))
+                 for i in range(n) for j in range(n)]
+    namen = ['IJsselstein' if (i, j) == (n // 2, n // 2) else f'Gemeente {i}-{j}' for i in range(n) for j in range(n)]
+    gpd.GeoDataFrame({'gemeentenaam': namen}, geometry=polygonen, crs='EPSG:28992').to_file(path, driver='GPKG')
+
+
+def hoekpunten(geometrie):
+    """
+    Returns the number of vertices of the (multi)polygons in geometrie
+    """
+
+    return sum(len(p.exterior.coords) + sum(len(r.coords) for r in p.interiors)
+               for g in geometrie for p in (g.geoms if g.geom_type == 'MultiPolygon' else [g]))
+
+
+def benchmark_kaart(gpkg=IJsselsteinloop.KAART, breedte_px=1200):
+    """
+    Load and draw time of the gemeente map at each resolution of the geometry cache, against reading the GeoPackage;
+    a synthetic GeoPackage is used when gpkg does not exist
+    """
+
+    import geopandas as gpd
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    def tekenen(kaart):
+        fig, ax = plt.subplots(figsize=(breedte_px / 100, breedte_px / 80), dpi=100)
+        kaart.plot(ax=ax, edgecolor='darkgrey', linewidth=0.4)
+        fig.canvas.draw()
+        plt.close(fig)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if not Path(gpkg).is_file():
+            gpkg = Path(directory) / 'synthetisch.gpkg'
+            synthetische_kaart(gpkg)
+        IJsselsteinloop.kaart_cache_bouwen(gpkg, directory)
+
+        print(f'kaart {Path(gpkg).name} (ms, drawn {breedte_px} px wide), resolutie_voor({breedte_px}): {IJsselsteinloop.resolutie_voor(breedte_px)}')
+        print(f'  {"":<8} {"laden":>8} {"tekenen":>8} {"hoekpunten":>11} {"MB":>6}')
+        volledig = gpd.read_file(gpkg)
+        print(f'  {"gpkg":<8} {timeit(gpd.read_file, gpkg) * 1000:8.1f} {timeit(tekenen, volledig) * 1000:8.1f} '
+              f'{hoekpunten(volledig.geometry):>11} {Path(gpkg).stat().st_size / 2 ** 20:6.1f}')
+        for resolutie in IJsselsteinloop.RESOLUTIES:
+            laden = timeit(IJsselsteinloop.kaart.__wrapped__, resolutie, gpkg, directory) # without the in-process cache
+            kaart = IJsselsteinloop.kaart.__wrapped__(resolutie, gpkg, directory)
+            print(f'  {resolutie:<8} {laden * 1000:8.1f} {timeit(tekenen, kaart) * 1000:8.1f} {hoekpunten(kaart.geometry):>11} '
+                  f'{IJsselsteinloop.kaart_pad(resolutie, gpkg, directory).stat().st_size / 2 ** 20:6.1f}')
+
+
+BRON = Path('data/uitslagen_2003_2019.csv')
+BASELINE = Path('benchmark_baseline.json')
+
+
+def synthetische_uitslagen(n, seed=0, bron=BRON):
+    """
+    Returns n synthetic results with the columns and value distributions of bron: races, woonplaatsen (raw, including
+    misspellings and missing values) and times per afstand are resampled, names are recombined from first and last names
+    """
+
+    rng = np.random.default_rng(seed)
+    uitslagen = pd.read_csv(bron, dtype=str)
+    rijen = uitslagen.iloc[rng.integers(0, len(uitslagen), n)].reset_index(drop=True)
+
+    # names: first name of one runner, last name of another
+    delen = uitslagen.naam.dropna().str.split(' ', n=1)
+    voornamen = delen.str[0].to_numpy()
+    achternamen = delen.str[1].fillna('').to_numpy()
+    naam = pd.Series(voornamen[rng.integers(0, len(voornamen), n)]) + ' ' + pd.Series(achternamen[rng.integers(0, len(achternamen), n)])
+
+    # times: resampled per afstand with up to a minute of noise, some written with dots as in the older results
+    seconden = IJsselsteinloop.parse_tijden(rijen.nettotijd)[0].astype(np.int64) + rng.integers(-60, 61, n)
+    seconden = np.clip(seconden, 600, 6 * 3600 - 1)
+    nettotijd = pd.Series([f'{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}' for s in seconden])
+    punten = rng.random(n) < 0.01
+    nettotijd[punten] = nettotijd[punten].str.replace(':', '.', regex=False)
+
+    # startnummers unique per jaar
+    startnummer = rijen.groupby('jaar').cumcount() + 1
+
+    return pd.DataFrame({'startnummer': startnummer.astype(str), 'naam': naam, 'woonplaats': rijen.woonplaats,
+                         'nettotijd': nettotijd, 'jaar': rijen.jaar.astype(int), 'klassement': rijen.klassement,
+                         'afstand': rijen.afstand})
+
+
+def synthetische_paginas(uitslagen):
+    """
+    Returns {url: results page} with one page per jaar and klassement code, rows as published on the website
+    """
+
+    codes = {waarde: code for code, waarde in IJsselsteinloop.KLASSEMENTEN.items()}
+    paginas = dict()
+    for (jaar, klassement, afstand), race in uitslagen.groupby(['jaar', 'klassement', 'afstand']):
+        rows = ''.join(f'<tr><td>{i + 1}</td><td>{r.startnummer}</td><td>{r.naam}</td><td>{r.woonplaats if isinstance(r.woonplaats, str) else "-"}</td>'
+                       f'<td>{klassement[0]}</td><td>{r.nettotijd}</td></tr>' for i, r in enumerate(race.itertuples()))
+        url = IJsselsteinloop.BASE_URL + f'uitslag/{jaar}/uitslag{jaar}{codes[(klassement, afstand)]}.htm'
+        paginas[url] = f'<html><body><table><tr><td>Plaats</td></tr>{rows}</table></body></html>'.encode()
+    return paginas
+
+
+def synthetische_afstanden(seed=0):
+    """
+    Returns a distance table gemeente -> tot_ijsselstein for the gemeenten in plaatsnaam_gemeente.csv
+    """
+
+    rng = np.random.default_rng(seed)
+    gemeenten = pd.read_csv('data/plaatsnaam_gemeente.csv').gemeente.drop_duplicates().sort_values()
+    return pd.DataFrame({'gemeente': gemeenten, 'tot_ijsselstein': rng.uniform(0, 250, len(gemeenten)).round(1)})
+
+
+def meten(func, invoer, repeat=3):
+    """
+    Returns the best wall time in seconds of repeat calls of func(*invoer()) and the peak memory in bytes
+    allocated by one call, invoer is called outside of the measurement
+    """
+
+    tijden = list()
+    for _ in range(repeat):
+        args = invoer()
+        start = time.perf_counter()
+        func(*args)
+        tijden.append(time.perf_counter() - start)
+
+    args = invoer()
+    tracemalloc.start()
+    func(*args)
+    geheugen = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(tijden), geheugen
+
+
+def suite_stages(uitslagen, cache):
+    """
+    Returns {stage: (function, input)} for the pipeline stages on the synthetic results
+    """
+
+    paginas = synthetische_paginas(uitslagen)
+    for url, content in paginas.items():
+        cache.put(url, content, dict())
+    afstanden = synthetische_afstanden()
+    schoon = IJsselsteinloop.nettotijd(IJsselsteinloop.woonplaatsen(IJsselsteinloop.namen(uitslagen.copy())))
+    verrijkt = IJsselsteinloop.gemeenten(schoon.copy(), afstanden)
+
+    return {'get_results': (lambda: IJsselsteinloop.get_results(list(paginas), offline=True), lambda: ()),
+            'namen': (IJsselsteinloop.namen, lambda: (uitslagen.copy(),)),
+            'woonplaatsen': (IJsselsteinloop.woonplaatsen, lambda: (uitslagen.copy(),)),
+            'nettotijd': (IJsselsteinloop.nettotijd, lambda: (uitslagen.copy(),)),
+            'gemeenten': (IJsselsteinloop.gemeenten, lambda: (schoon.copy(), afstanden)),
+            'nettotijd_sec': (IJsselsteinloop.nettotijd_sec, lambda: (verrijkt.copy(),))}
+
+
+def benchmark_suite(schalen=(1, 10, 100), baseline=BASELINE, opslaan=False, drempel=1.5, repeat=3):
+    """
+    Times and memory-profiles each pipeline stage on synthetic results at the given scales of data/uitslagen_2003_2019.csv.
+    Returns the regressions: measurements more than drempel times their baseline. With opslaan the measurements
+    are stored as the new baseline.
+    """
+
+    basis = sum(1 for _ in BRON.open(encoding='utf-8')) - 1
+    IJsselsteinloop.woonplaatsen(pd.DataFrame({'woonplaats': ['IJsselstein']})) # load alias table and place names
+    baselines = json.loads(baseline.read_text()) if baseline.is_file() else dict()
+    metingen, regressies = dict(), list()
+
+    cache = IJsselsteinloop.response_cache
+    with tempfile.TemporaryDirectory() as directory:
+        IJsselsteinloop.ophalen.response_cache = IJsselsteinloop.ResponseCache(directory)
+        try:
+            print(f'{"stage":<14} {"schaal":>6} {"rijen":>9} {"tijd (ms)":>10} {"geheugen (MB)":>14}  baseline')
+            for schaal in schalen:
+                uitslagen = synthetische_uitslagen(basis * schaal)
+                for stage, (func, invoer) in suite_stages(uitslagen, IJsselsteinloop.response_cache).items():
+                    tijd, geheugen = meten(func, invoer, repeat)
+                    sleutel = f'{stage}/{schaal}x'
+                    metingen[sleutel] = {'tijd': tijd, 'geheugen': geheugen}
+                    vorige = baselines.get(sleutel)
+                    vergelijking = ''
+                    if vorige:
+                        vergelijking = f'{tijd / vorige["tijd"]:5.2f}x tijd {geheugen / vorige["geheugen"]:5.2f}x geheugen'
+                        if tijd > drempel * vorige['tijd'] or geheugen > drempel * vorige['geheugen']:
+                            regressies.append(sleutel)
+                            vergelijking += '  REGRESSIE'
+                    print(f'{stage:<14} {schaal:>5}x {len(uitslagen):>9} {tijd * 1000:>10.1f} {geheugen / 2 ** 20:>14.1f}  {vergelijking}')
+        finally:
+            IJsselsteinloop.ophalen.response_cache = cache
+
+    if opslaan:
+        baseline.write_text(json.dumps({**baselines, **metingen}, indent=1, sort_keys=True))
+    return regressies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='IJsselsteinloop benchmarks')
+    parser.add_argument('benchmark', nargs='?', choices=['suite', 'vergelijken', 'kaart'], default='suite')
+    parser.add_argument('--schalen', type=int, nargs='+', default=[1, 10, 100], help='scales of the synthetic data')
+    parser.add_argument('--drempel', type=float, default=1.5, help='fail when a stage is this many times slower or larger than its baseline')
+    parser.add_argument('--opslaan', action='store_true', help='store the measurements as the new baseline')
+    args = parser.parse_args()
+
+    if args.benchmark == 'vergelijken':
+        benchmark_parse_results()
+        benchmark_opslag()
+        benchmark_woonplaatsen()
+        benchmark_plaatsnaam_index()
+        benchmark_parse_tijden()
+    elif args.benchmark == 'kaart':
+        benchmark_kaart()
+    else:
+        regressies = benchmark_suite(args.schalen, opslaan=args.opslaan, drempel=args.drempel)
+        if regressies:
+            print(f'regressions beyond {args.drempel}x baseline: {", ".join(regressies)}')
+            sys.exit(1)
@@ -0,0 +1,379 @@
+"""
+Batch report of the IJsselsteinloop figures for every year, run with: python rapport_IJsselsteinloop.py [--start 1999] [--eind 2019]
+
+The figures of the notebook are rendered headless (Agg) for each year in a process pool, plus the figures over all years.
+Dense series are thinned before swarm and violin plots, and years whose data and renderer are unchanged since the
+previous run (hashes in rapport/hashes.json) are skipped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+import IJsselsteinloop
+
+
+KLEUREN = {'Damesklassement': '#ff0080', 'Herenklassement': '#3498db'}
+AFSTANDEN = {'5 km': 5.000, '10 km': 10.000, '21.1 km': 21.0975}
+KAART = 'data/2019_gemeentegrenzen_kustlijn.gpkg'
+KAART_BREEDTE = 1200 # pixels, the maps are 12 inch wide at 100 dpi
+UITVOER = Path('rapport')
+MAX_PUNTEN = {'swarm': 300, 'violin': 2000} # per afstand and klassement
+
+kaart = None # gemeente boundaries, loaded once per worker process
+
+
+def laden_kaart(path=KAART):
+    """
+    Loads the gemeente boundaries in the worker process from the geometry cache, at the resolution of the maps
+    """
+
+    global kaart
+    kaart = IJsselsteinloop.kaart(IJsselsteinloop.resolutie_voor(KAART_BREEDTE), path)
+
+
+def uitdunnen(df, maximum, kolom='nettotijd_sec'):
+    """
+    Returns at most maximum results per afstand and klassement, evenly spread over the sorted times,
+    so the shape and quantiles of the distribution are kept
+    """
+
+    delen = list()
+    for _, groep in df.dropna(subset=[kolom]).groupby(['afstand', 'klassement'], observed=True):
+        groep = groep.sort_values(kolom)
+        if len(groep) > maximum:
+            groep = groep.iloc[np.linspace(0, len(groep) - 1, maximum).round().astype(int)]
+        delen.append(groep)
+    return pd.concat(delen) if delen else df.iloc[:0]
+
+
+def tijd_as(ax, tijden, as_='x', stap=15 * 60):
+    """
+    Sets ticks every stap seconds over the range of tijden, labelled as 'HH:MM:SS'
+    """
+
+    ticks = np.arange(tijden.min() // stap * stap, (tijden.max() // stap + 1) * stap + 1, stap)
+    labels = pd.to_datetime(ticks, unit='s').strftime('%H:%M:%S')
+    if as_ == 'x':
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(labels)
+    else:
+        ax.set_yticks(ticks)
+        ax.set_yticklabels(labels)
+
+
+def kaart_figuur(waarden, kolom, categorieen, titel, legenda, cmap='Reds', labels=None):
+    """
+    Returns a choropleth of the gemeenten, waarden: DataFrame with gemeente and kolom
+    gemeenten without a value are white, the others coloured by bin_categories(kolom, categorieen)
+    """
+
+    df = pd.merge(kaart, waarden, how='left', left_on='gemeentenaam', right_on='gemeente')
+    df['categorie'] = IJsselsteinloop.bin_categories(df[kolom], categorieen, labels, out_of_range='clip')
+
+    fig, ax = plt.subplots(figsize=(12, 15))
+    df[df.categorie.isna()].plot(ax=ax, color='white', edgecolor='darkgrey', linewidth=0.4)
+    df[df.categorie.notna()].plot(ax=ax, column='categorie', categorical=True, cmap=cmap,
+                                  legend=True, edgecolor='darkgrey', linewidth=0.4)
+    ax.set_title(titel, fontsize=18)
+    legend = ax.get_legend()
+    if legend is not None:
+        legend.get_frame().set_alpha(0.8)
+        legend.set_bbox_to_anchor((1.15, -0.05, 0, 1))
+        legend.set_title(legenda)
+    ax.axis('off')
+    return fig
+
+
+def figuur_verdeling(df, jaar):
+    """
+    Verdeling deelnemers per afstand en klassement
+    """
+
+    df = df.assign(klassement=df.klassement.astype(str).str.replace('klassement', ''))
+    groepen = df.groupby('afstand', observed=True).size()
+    subgroepen = df.groupby(['afstand', 'klassement'], observed=True).size()
+
+    vk, tk, hm = [plt.cm.Oranges, plt.cm.Blues, plt.cm.Purples]
+    fig, ax = plt.subplots(figsize=(10, 10))
+    ax.axis('equal')
+    ring, _ = ax.pie(groepen, radius=1.3, labels=groepen.index, colors=[vk(0.7), tk(0.7), hm(0.7)][:len(groepen)])
+    plt.setp(ring, width=0.33, edgecolor='white')
+    ring, _ = ax.pie(subgroepen, radius=1.3 - 0.3, labels=subgroepen.index.get_level_values('klassement'), labeldistance=0.75,
+                     colors=[vk(0.5), vk(0.3), tk(0.5), tk(0.3), hm(0.5), hm(0.3)][:len(subgroepen)])
+    plt.setp(ring, width=0.33, edgecolor='white')
+    fig.suptitle(f'Verdeling deelnemers per afstand in {jaar}', fontsize=18)
+    ax.text(-0.35, 1.4, f'{df.shape[0]} deelnemers in totaal', fontsize=12)
+    return fig
+
+
+def figuur_deelnemers_gemeente(df, jaar):
+    """
+    Aantal deelnemers per gemeente
+    """
+
+    aantal = df.groupby('gemeente', observed=True).size().to_frame('aantal').reset_index()
+    return kaart_figuur(aantal, 'aantal', [5, 10, 15, 20, 25, 50, 100, 250, 500, 1000],
+                        f'Aantal deelnemers per gemeente in {jaar}', 'Deelnemers')
+
+
+def figuur_reisafstand(df, jaar):
+    """
+    Reisafstand deelnemers naar IJsselstein
+    """
+
+    fig, ax = plt.subplots(figsize=(16, 9))
+    sns.boxplot(ax=ax, data=df, x='tot_ijsselstein', y='afstand', hue='klassement', hue_order=list(KLEUREN),
+                palette=list(KLEUREN.values()), notch=True, linewidth=2)
+    ax.legend(loc='lower right')
+    ax.set_title(f'Reisafstand deelnemers naar IJsselstein in {jaar}', fontsize=18)
+    ax.set_xlabel('Reisafstand in kilometers', fontsize=14)
+    ax.set_ylabel('Parcours', fontsize=14)
+    return fig
+
+
+def figuur_top10(df, jaar):
+    """
+    Top 10 plaatsen op basis van aantal deelnemers
+    """
+
+    # as str: the counts of a categorical woonplaats keep all its categories, which the barplot would all lay out
+    top = df.woonplaats.dropna().astype(str).value_counts().head(10).rename_axis('woonplaats').to_frame('aantal').reset_index()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.barplot(ax=ax, data=top, x='woonplaats', y='aantal', order=top.woonplaats, palette=sns.color_palette('Reds_r', len(top)))
+    ax.set_title(f'Top 10 plaatsen op basis van deelname in {jaar}', fontsize=18)
+    ax.set_xlabel('Woonplaats', fontsize=14)
+    ax.set_ylabel('Aantal deelnemers', fontsize=14)
+    return fig
+
+
+def figuur_deelnemers_afstand(df, jaar):
+    """
+    Aantal deelnemers per afstand en klassement
+    """
+
+    aantal = df.groupby(['afstand', 'klassement'], observed=True).size().to_frame('aantal').reset_index()
+    fig, ax = plt.subplots(figsize=(12, 7))
+    sns.barplot(ax=ax, data=aantal, x='afstand', y='aantal', hue='klassement', hue_order=list(KLEUREN),
+                palette=list(KLEUREN.values()), order=[a for a in AFSTANDEN if a in set(aantal.afstand)])
+    ax.set_title(f'Aantal deelnemers per afstand in {jaar}', fontsize=18)
+    ax.set_xlabel('Afstand', fontsize=14)
+    ax.set_ylabel('Aantal deelnemers', fontsize=14)
+    return fig
+
+
+def figuur_violin(df, jaar):
+    """
+    Uitslagen per afstand (violin), at most MAX_PUNTEN['violin'] times per afstand and klassement
+    """
+
+    df = uitdunnen(df, MAX_PUNTEN['violin'])
+    fig, ax = plt.subplots(figsize=(16, 9))
+    sns.violinplot(ax=ax, data=df, x='nettotijd_sec', y='afstand', order=[a for a in AFSTANDEN if a in set(df.afstand)],
+                   hue='klassement', hue_order=list(KLEUREN), palette=list(KLEUREN.values()),
+                   split=True, orient='h', inner='quartiles')
+    tijd_as(ax, df.nettotijd_sec, 'x')
+    ax.set_title(f'Uitslagen per afstand in {jaar}', fontsize=18)
+    ax.set_xlabel('Nettotijd', fontsize=14)
+    ax.set_ylabel('Afstand', fontsize=14)
+    ax.legend(loc='best')
+    return fig
+
+
+def figuur_swarm(df, jaar):
+    """
+    Uitslagen per afstand (swarm), at most MAX_PUNTEN['swarm'] times per afstand and klassement
+    """
+
+    df = uitdunnen(df, MAX_PUNTEN['swarm'])
+    fig, ax = plt.subplots(figsize=(16, 16))
+    sns.swarmplot(ax=ax, data=df, x='afstand', y='nettotijd_sec', order=[a for a in AFSTANDEN if a in set(df.afstand)],
+                  hue='klassement', hue_order=list(KLEUREN), palette=list(KLEUREN.values()), size=3)
+    tijd_as(ax, df.nettotijd_sec, 'y')
+    ax.set_title(f'Uitslagen per afstand in {jaar}', fontsize=18)
+    ax.set_xlabel('Afstand', fontsize=14)
+    ax.set_ylabel('Nettotijd', fontsize=14)
+    ax.legend(loc='upper left')
+    return fig
+
+
+def figuur_boxplot(df, jaar):
+    """
+    Uitslagen per afstand (boxplot)
+    """
+
+    df = df.dropna(subset=['nettotijd_sec'])
+    fig, ax = plt.subplots(figsize=(16, 8))
+    sns.boxplot(ax=ax, data=df, x='nettotijd_sec', y='afstand', order=[a for a in AFSTANDEN if a in set(df.afstand)],
+                hue='klassement', hue_order=['Herenklassement', 'Damesklassement'],
+                palette=[KLEUREN['Herenklassement'], KLEUREN['Damesklassement']], linewidth=1.5, notch=True, orient='h')
+    tijd_as(ax, df.nettotijd_sec, 'x')
+    ax.set_title(f'Uitslagen per afstand in {jaar}', fontsize=18)
+    ax.set_xlabel('Nettotijd', fontsize=14)
+    ax.set_ylabel('Afstand', fontsize=14)
+    return fig
+
+
+def figuur_pace(df, jaar, afstand):
+    """
+    Hoogste tempo (pace) per gemeente op een afstand
+    """
+
+    snelste = df[df.afstand == afstand].groupby('gemeente', observed=True).nettotijd_sec.min().dropna()
+    if snelste.empty:
+        return None
+    pace = (snelste / AFSTANDEN[afstand]).to_frame('pace_sec').reset_index()
+    stap = 15 # seconds per category
+    indeling = list(np.arange(pace.pace_sec.min() // stap * stap, (pace.pace_sec.max() // stap + 1) * stap + 1, stap))
+    labels = {i: '≤ {}'.format(pd.to_datetime(i, unit='s').strftime('%H:%M:%S')) for i in indeling}
+    return kaart_figuur(pace, 'pace_sec', indeling, f'Hoogste tempo (pace) per gemeente op de {afstand} in {jaar}',
+                        'Pace (min/km)', 'Reds_r', labels)
+
+
+def figuur_deelnemers_per_jaar(df):
+    """
+    Aantal deelnemers per jaar en afstand
+    """
+
+    aantal = df.groupby(['jaar', 'afstand'], observed=True).size().to_frame('aantal').reset_index()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.lineplot(ax=ax, data=aantal, x='jaar', y='aantal', hue='afstand', hue_order=list(AFSTANDEN), markers=True, linewidth=4)
+    ax.set_xticks(aantal.jaar.unique())
+    ax.set_title('Aantal deelnemers per jaar', fontsize=18)
+    ax.set_xlabel('Jaar', fontsize=14)
+    ax.set_ylabel('Aantal deelnemers', fontsize=14)
+    return fig
+
+
+def figuur_reisafstand_per_jaar(df):
+    """
+    Gemiddelde reisafstand deelnemers per jaar en afstand
+    """
+
+    gemiddeld = df.groupby(['jaar', 'afstand'], observed=True).tot_ijsselstein.mean().dropna().to_frame('afstand_km').reset_index()
+    fig, ax = plt.subplots(figsize=(16, 9))
+    sns.lineplot(ax=ax, data=gemiddeld, x='jaar', y='afstand_km', hue='afstand', hue_order=list(AFSTANDEN), linewidth=4)
+    ax.set_xticks(gemiddeld.jaar.unique())
+    ax.set_title('Gemiddelde reisafstand deelnemers per parcours', fontsize=18)
+    ax.set_xlabel('Jaar', fontsize=14)
+    ax.set_ylabel('Reisafstand in kilometers', fontsize=14)
+    return fig
+
+
+def figuur_heatmap(df, kolom):
+    """
+    Heatmap deelnemers per jaar en afstand of klassement
+    """
+
+    pv = df.groupby([kolom, 'jaar'], observed=True).size().unstack('jaar')
+    fig, ax = plt.subplots(figsize=(17.5, 0.6 + 0.45 * len(pv)))
+    sns.heatmap(pv, ax=ax, cmap='Blues')
+    ax.set_title(f'Deelnemers per {kolom}', fontsize=18)
+    ax.set_xlabel('Jaar', fontsize=14)
+    ax.set_ylabel(kolom.capitalize(), fontsize=14)
+    return fig
+
+
+# figures per year: name -> function(df, jaar), and over all years: name -> function(df)
+FIGUREN = {'verdeling': figuur_verdeling,
+           'deelnemers_gemeente': figuur_deelnemers_gemeente,
+           'reisafstand': figuur_reisafstand,
+           'top10_woonplaatsen': figuur_top10,
+           'deelnemers_afstand': figuur_deelnemers_afstand,
+           'violin': figuur_violin,
+           'swarm': figuur_swarm,
+           'boxplot': figuur_boxplot,
+           **{f'pace_{afstand.split()[0]}km': lambda df, jaar, afstand=afstand: figuur_pace(df, jaar, afstand) for afstand in AFSTANDEN}}
+FIGUREN_ALLE_JAREN = {'deelnemers_per_jaar': figuur_deelnemers_per_jaar,
+                      'reisafstand_per_jaar': figuur_reisafstand_per_jaar,
+                      'heatmap_afstand': lambda df: figuur_heatmap(df, 'afstand'),
+                      'heatmap_klassement': lambda df: figuur_heatmap(df, 'klassement')}
+
+
+def data_hash(df):
+    """
+    Returns the hash of the figures' input: the data and the source of this renderer
+    """
+
+    h = hashlib.sha1(Path(__file__).read_bytes())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def renderen(df, jaar, uitvoer):
+    """
+    Renders the figures of one year (jaar None: all years) to uitvoer/{jaar}/{figuur}.png, returns the number of figures
+    """
+
+    figuren = FIGUREN_ALLE_JAREN if jaar is None else FIGUREN
+    directory = Path(uitvoer) / ('alle_jaren' if jaar is None else str(jaar))
+    directory.mkdir(parents=True, exist_ok=True)
+    aantal = 0
+    for naam, functie in figuren.items():
+        fig = functie(df) if jaar is None else functie(df, jaar)
+        if fig is None:
+            continue
+        fig.savefig(directory / f'{naam}.png', bbox_inches='tight')
+        plt.close(fig)
+        aantal += 1
+    return aantal
+
+
+def rapport(start_jaar, eind_jaar, uitvoer=UITVOER, max_workers=None, forceren=False, kaart_path=KAART):
+    """
+    Renders the report for start_jaar up to and including eind_jaar in a process pool, one task per year and one
+    for the figures over all years; years whose hash is unchanged since the previous run are skipped
+    Returns {jaar: number of figures rendered}
+    """
+
+    uitslagen = IJsselsteinloop.verwerken(eind_jaar)
+    uitslagen = IJsselsteinloop.compact(uitslagen[uitslagen.jaar >= start_jaar])
+
+    manifest_path = Path(uitvoer) / 'hashes.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.is_file() else dict()
+    taken = {jaar: uitslagen[uitslagen.jaar == jaar] for jaar in range(start_jaar, eind_jaar + 1)}
+    taken['alle_jaren'] = uitslagen
+    hashes = {str(jaar): data_hash(df) for jaar, df in taken.items()}
+    taken = {jaar: df for jaar, df in taken.items() if forceren or manifest.get(str(jaar)) != hashes[str(jaar)]}
+
+    laden_kaart(kaart_path) # builds the geometry cache when needed, before the workers read it
+    gerenderd = dict()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=laden_kaart, initargs=(kaart_path,)) as executor:
+        futures = {executor.submit(renderen, df, None if jaar == 'alle_jaren' else jaar, uitvoer): jaar for jaar, df in taken.items()}
+        for future in as_completed(futures):
+            jaar = futures[future]
+            gerenderd[jaar] = future.result()
+            manifest[str(jaar)] = hashes[str(jaar)]
+
+    Path(uitvoer).mkdir(parents=True, exist_ok=True)
+    tmp = manifest_path.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    os.replace(tmp, manifest_path)
+    return gerenderd
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the IJsselsteinloop figures for every year')
+    parser.add_argument('--start', type=int, default=1999, help='first year')
+    parser.add_argument('--eind', type=int, default=2019, help='last year')
+    parser.add_argument('--uitvoer', type=Path, default=UITVOER, help='output directory')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, default the number of CPUs')
+    parser.add_argument('--forceren', action='store_true', help='render all figures, also when their data is unchanged')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    gerenderd = rapport(args.start, args.eind, args.uitvoer, args.workers, args.forceren)
+    overgeslagen = args.eind - args.start + 2 - len(gerenderd)
+    print(f'{sum(gerenderd.values())} figures rendered for {len(gerenderd)} years, {overgeslagen} unchanged, '
+          f'{time.perf_counter() - start:.1f} s')
@@ -1,8 +1,99 @@
+import functools
+import geopandas as gpd
+import hashlib
+import http.server
+import io
+import json
+import os
 import pandas as pd
+import pytest
 import random
 import re
+import subprocess
+import sys
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from shapely.geometry import box
 
 import IJsselsteinloop
+import benchmark_IJsselsteinloop
+
+
+def results_page(rows):
+    """
+    Saved results page with a header row and rows of [plaats, startnummer, naam, woonplaats, categorie, nettotijd]
+    """
+
+    cells = ''.join('<tr>{}</tr>'.format(''.join(f'<td>{cell}</td>' for cell in row)) for row in rows)
+    return f'<html><body><table><tr><td>Plaats</td></tr>{cells}</table></body></html>'
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """
+    Local HTTP stand-in for www.ijsselsteinloop.nl serving saved pages for 2003, with an empty response cache
+    """
+
+    monkeypatch.setattr(IJsselsteinloop.ophalen, 'response_cache', IJsselsteinloop.ResponseCache(tmp_path / 'cache'))
+    (tmp_path / 'uitslag' / '2003').mkdir(parents=True)
+    (tmp_path / 'uitslag' / '2003' / 'index.htm').write_text('<a href="uitslag2003h12.htm">Heren</a><a href="uitslag2003d12.htm">Dames</a><a href="../index.htm">Home</a>')
+    (tmp_path / 'uitslag' / '2003' / 'uitslag2003h12.htm').write_text(results_page([[i, 700 + i, f'Loper {i}', 'IJsselstein', 'H', f'01:{20 + i}:00'] for i in range(1, 4)]))
+    (tmp_path / 'uitslag' / '2003' / 'uitslag2003d12.htm').write_text(results_page([[i, 900 + i, f'Loopster {i}', 'Lopik', f'01:{30 + i}:00'] for i in range(1, 3)]))
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+
+
+@pytest.fixture
+def live_site(tmp_path, monkeypatch):
+    """
+    Local HTTP stand-in serving the pages in the yielded dictionary {path: html}, which the test can change while it runs,
+    with an ETag per page and 304 Not Modified on If-None-Match; the status codes served are in pages['status']
+    """
+
+    monkeypatch.setattr(IJsselsteinloop.ophalen, 'response_cache', IJsselsteinloop.ResponseCache(tmp_path / 'cache'))
+    pages = {'status': []}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            content = pages.get(self.path.lstrip('/'), '').encode()
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            status = 404 if not content else 304 if self.headers.get('If-None-Match') == etag else 200
+            pages['status'].append(status)
+            self.send_response(status)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(content) if status == 200 else 0))
+            self.end_headers()
+            if status == 200:
+                self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pages['url'] = f'http://127.0.0.1:{server.server_port}/'
+    yield pages
+    server.shutdown()
+
+
+def importeren(code):
+    """
+    Runs code in a new interpreter with -X importtime, returns the cumulative import time in seconds of the IJsselsteinloop
+    modules it imports directly and the heavy dependencies that were imported
+    """
+
+    zwaar = ['pandas', 'geopandas', 'requests', 'bs4', 'lxml', 'tqdm']
+    uitvoer = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'{code}\nimport sys\nprint(*[m for m in {zwaar!r} if m in sys.modules])'],
+                             capture_output=True, text=True, check=True)
+    tijden = [re.match(r'import time:\s+\d+ \|\s+(\d+) \| (IJsselsteinloop\S*)$', regel) for regel in uitvoer.stderr.splitlines()]
+    return sum(int(m.group(1)) for m in tijden if m) / 1e6, uitvoer.stdout.split()
+
 
 def test_get_urls():
     assert len(IJsselsteinloop.get_urls(2003, 2019)) == 253, "Should be 253"
@@ -10,6 +101,115 @@ def test_get_urls():
 def test_get_results():
     assert IJsselsteinloop.get_results(IJsselsteinloop.get_urls(2003, 2003)[:2]).shape == (242, 7), "Should be (242, 7)"
 
+def test_get_urls_site(site):
+    assert IJsselsteinloop.get_urls(2003, 2003, base_url=site) == [site + 'uitslag/2003/uitslag2003h12.htm', site + 'uitslag/2003/uitslag2003d12.htm']
+
+def test_get_results_site(site):
+    assert IJsselsteinloop.get_results(IJsselsteinloop.get_urls(2003, 2003, base_url=site), max_workers=2).shape == (5, 7), "Should be (5, 7)"
+
+def test_instrumenteren(site, tmp_path):
+    with IJsselsteinloop.instrumenteren(tmp_path / 'metingen.jsonl') as instrumentatie:
+        IJsselsteinloop.woonplaatsen(IJsselsteinloop.get_results(IJsselsteinloop.get_urls(2003, 2003, base_url=site), max_workers=2).assign(woonplaats=['IJsselstein', 'Nergenshuizen', None, 'Lopik', 'Lopik']))
+    assert instrumentatie.samenvatting().loc[['get_urls', 'get_results', 'woonplaatsen'], ['http_requests', 'rijen_uit', 'woonplaats_nan_uit']].fillna(-1).values.tolist() == [[1, -1, -1], [2, 5, 0], [0, 5, 2]]
+    assert len((tmp_path / 'metingen.jsonl').read_text().splitlines()) == 3 and IJsselsteinloop.instrumentatie is None
+
+def test_live_uitslagen(live_site):
+    live_site['uitslag/2003/index.htm'] = '<a href="uitslag2003h12.htm">Heren</a><a href="uitslag2003d12.htm">Dames</a>'
+    live_site['uitslag/2003/uitslag2003h12.htm'] = results_page([[1, 701, 'Loper 1', 'IJsselstein', 'H', '01:21:00']])
+    live_site['uitslag/2003/uitslag2003d12.htm'] = results_page([[1, 901, 'Loopster 1', 'Lopik', '01:31:00']])
+    live = IJsselsteinloop.LiveUitslagen(2003, base_url=live_site['url'], max_workers=2, afstanden=pd.DataFrame({'gemeente': ['IJsselstein', 'Lopik'], 'tot_ijsselstein': [0.0, 5.0]}))
+    assert live.peilen()[['startnummer', 'wijziging', 'gemeente']].values.tolist() == [[901, 'nieuw', 'Lopik'], [701, 'nieuw', 'IJsselstein']]
+    live_site['status'].clear()
+    assert live.peilen().empty and live_site['status'] == [304, 304, 304]
+    live_site['uitslag/2003/uitslag2003h12.htm'] = results_page([[1, 702, 'Loper 2', 'Lopik', 'H', '01:20:00'], [2, 701, 'Loper 1', 'IJsselstein', 'H', '01:21:30']])
+    assert live.peilen()[['startnummer', 'wijziging', 'nettotijd_sec']].values.tolist() == [[702, 'nieuw', 4800], [701, 'gewijzigd', 4890]]
+    assert [len(wijzigingen) for wijzigingen in live.volgen(interval=0, peilingen=2)] == []
+
+def test_dienst(tmp_path):
+    def uitslagen():
+        return pd.read_csv(tmp_path / 'uitslagen.csv')
+    def opvragen(query):
+        with urllib.request.urlopen(dienst.url + query) as r:
+            return json.loads(r.read())
+    pd.DataFrame({'startnummer': [1, 2, 3], 'naam': ['Jan de Vries', 'Piet Vries', 'Anna Jansen'], 'jaar': 2019, 'afstand': '10 km', 'klassement': ['Herenklassement', 'Herenklassement', 'Damesklassement'],
+                  'gemeente': ['Lopik', 'IJsselstein', 'Lopik'], 'nettotijd_sec': [3000, 2900, 3100], 'runner_id': [1, 2, 3]}).to_csv(tmp_path / 'uitslagen.csv', index=False)
+    dienst = IJsselsteinloop.Dienst(uitslagen, [tmp_path / 'uitslagen.csv'], port=0, interval=60).starten()
+    try:
+        assert [u['naam'] for u in opvragen('namen?prefix=VRIES')] == ['Jan de Vries', 'Piet Vries'] and len(opvragen('namen?prefix=jan')) == 2
+        assert [u['startnummer'] for u in opvragen('top?jaar=2019&afstand=10%20km&klassement=Herenklassement&n=1')] == [2]
+        assert [u['naam'] for u in opvragen('gemeente?gemeente=Lopik&jaar=2019')] == ['Jan de Vries', 'Anna Jansen']
+        assert opvragen('startnummer?jaar=2019&startnummer=3')[0]['runner_id'] == 3 and opvragen('loper?runner_id=4') == []
+        with ThreadPoolExecutor(8) as executor:
+            assert all(len(r) == 1 for r in executor.map(lambda i: opvragen(f'startnummer?jaar=2019&startnummer={i % 3 + 1}'), range(64)))
+        with pytest.raises(urllib.error.HTTPError, match='400'):
+            opvragen('top?jaar=twee')
+        assert not dienst.herladen()
+        uitslagen().assign(jaar=2020).to_csv(tmp_path / 'uitslagen.csv', index=False)
+        os.utime(tmp_path / 'uitslagen.csv', ns=(0, 0))
+        assert dienst.herladen() and opvragen('startnummer?jaar=2020&startnummer=1')[0]['naam'] == 'Jan de Vries'
+    finally:
+        dienst.stoppen()
+
+def test_dienst_aliassen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    pd.DataFrame({'plaatsnaam': ['Utrecht'], 'gemeente': ['Utrecht']}).to_csv('data/plaatsnaam_gemeente.csv', index=False)
+    aliassen = tmp_path / 'data' / 'woonplaatsen_aliassen.json'
+    aliassen.write_text(json.dumps({'versie': 1, 'aliassen': [{'woonplaats': 'Utrecht', 'aliassen': ['Utrecgt']}]}))
+    uitslagen = pd.DataFrame({'startnummer': ['1', '2'], 'naam': ['Jan de Vries', 'Piet Vries'], 'woonplaats': ['Utrecht', 'Utrecgt'], 'jaar': 2019, 'afstand': '10 km', 'klassement': 'Herenklassement'})
+    for tabel in IJsselsteinloop.dienst.TABELLEN:
+        tabel.cache_clear()
+    dienst = IJsselsteinloop.Dienst(lambda: IJsselsteinloop.woonplaatsen(uitslagen.copy()), [aliassen], port=0, interval=60).starten()
+    try:
+        assert dienst.index.uitslagen.woonplaats.tolist() == ['Utrecht', 'Utrecht']
+        aliassen.write_text(json.dumps({'versie': 1, 'aliassen': []}))
+        os.utime(aliassen, ns=(0, 0))
+        assert dienst.herladen() and dienst.index.uitslagen.woonplaats.fillna('-').tolist() == ['Utrecht', '-']
+    finally:
+        dienst.stoppen()
+        for tabel in IJsselsteinloop.dienst.TABELLEN:
+            tabel.cache_clear()
+
+def test_uitslagen_index_startnummer():
+    uitslagen = pd.DataFrame({'startnummer': ['123', ' 7', None], 'naam': ['Jan de Vries', 'Piet Vries', 'Anna Jansen'], 'woonplaats': 'Lopik', 'nettotijd': '00:50:00', 'jaar': 2019, 'afstand': '10 km', 'klassement': 'Herenklassement'})
+    assert [len(IJsselsteinloop.UitslagenIndex(df).startnummer(2019, nummer)) for df in [uitslagen, IJsselsteinloop.typeren(uitslagen)] for nummer in [123, '123', 7, 8]] == [1, 1, 1, 0] * 2
+
+def test_fetch_all(site):
+    assert IJsselsteinloop.fetch_all([site + 'uitslag/2003/index.htm'] * 4, max_workers=2) == [IJsselsteinloop.fetch(site + 'uitslag/2003/index.htm')] * 4
+
+def test_fetch_offline(site):
+    urls = IJsselsteinloop.get_urls(2003, 2003, base_url=site)
+    assert IJsselsteinloop.get_urls(2003, 2003, base_url=site, offline=True) == urls
+    assert IJsselsteinloop.fetch(urls[0]) == IJsselsteinloop.fetch(urls[0], offline=True) # revalidated (304)
+    with pytest.raises(FileNotFoundError):
+        IJsselsteinloop.fetch(site + 'uitslag/2004/index.htm', offline=True)
+
+def test_ophalen_partities(site, tmp_path):
+    assert IJsselsteinloop.ophalen_partities([2003], directory=tmp_path / 'uitslagen', base_url=site) == {2003: ['h12', 'd12']}
+    assert IJsselsteinloop.ophalen_data(2003, start_jaar=2003, klassementen=['d12'], directory=tmp_path / 'uitslagen').shape == (2, 7), "Should be (2, 7)"
+
+def test_lezen_uitslagen():
+    IJsselsteinloop.importeren_csv()
+    assert IJsselsteinloop.lezen_uitslagen(['naam', 'nettotijd_sec'], jaar=2019, afstand='21.1 km').shape == (365, 2), "Should be (365, 2)"
+
+def test_typeren():
+    assert IJsselsteinloop.typeren(pd.DataFrame({'startnummer': ['856.0', '-'], 'naam': ['Frans Woerden', 'Ben van Dijk'], 'woonplaats': ['Mijdrecht', 'onbekend'], 'nettotijd': ['01.17.11', '01:19:46'], 'jaar': ['2002', '2002'], 'klassement': ['Herenklassement'] * 2, 'afstand': ['21.1 km'] * 2})).nettotijd_sec.tolist() == [4631, 4786]
+
+def test_parse_results():
+    assert list(IJsselsteinloop.parse_results(results_page([[1, 751, 'Michael Woerden', 'Mijdrecht', '01:19:21']]).encode(), IJsselsteinloop.BASE_URL + 'uitslag/2003/uitslag2003h12.htm')) == [('751', 'Michael Woerden', 'Mijdrecht', '01:19:21', 2003, 'Herenklassement', '21.1 km')]
+
+def test_ophalen_evenementen(site, tmp_path):
+    (tmp_path / 'uitslag' / '2001').mkdir()
+    for pagina in (tmp_path / 'uitslag' / '2003').iterdir():
+        (tmp_path / 'uitslag' / '2001' / pagina.name.replace('2003', '2001')).write_text(pagina.read_text().replace('2003', '2001'))
+    assert IJsselsteinloop.ophalen_evenementen({'ander': site}, [2001], directory=tmp_path / 'evenementen') == {'ander': {2001: ['h12', 'd12']}}
+
+def test_get_legacy(tmp_path, monkeypatch):
+    monkeypatch.setattr(IJsselsteinloop.ophalen, 'response_cache', IJsselsteinloop.ResponseCache(tmp_path / 'cache'))
+    heren, dames = results_page([[1, 751, 'Michael Woerden', 'Mijdrecht', '01:19:21'], [2, 601, 'Lahcen Ait Naceur', 'Den Haag', '01:20:37']]), results_page([[1, 33, 'Agnes Hijman', ' IJsselstein ', '01:21:36']])
+    IJsselsteinloop.response_cache.put(IJsselsteinloop.BASE_URL + 'uitslag/2001/index.htm', (heren + dames).encode(), {})
+    assert IJsselsteinloop.get_legacy([2001], offline=True).values.tolist() == [['751', 'Michael Woerden', 'Mijdrecht', '01:19:21', 'Herenklassement', 2001, '21.1 km'], ['601', 'Lahcen Ait Naceur', 'Den Haag', '01:20:37', 'Herenklassement', 2001, '21.1 km'], ['33', 'Agnes Hijman', 'IJsselstein', '01:21:36', 'Damesklassement', 2001, '21.1 km']]
+
 def test_get_data_2002():
     assert IJsselsteinloop.get_data_2002().shape == (301, 7), "Should be (20, 7)"
 
@@ -34,12 +234,165 @@ def test_category():
 def test_category_labels():
     assert IJsselsteinloop.category_labels([10, 20, 30, 40, 50]) == {10: '1 - 10', 20: '11 - 20', 30: '21 - 30', 40: '31 - 40', 50: '41 - 50'}, "Should be {10: '1 - 10', 20: '11 - 20', 30: '21 - 30', 40: '31 - 40', 50: '41 - 50'}"
 
+def test_bin_categories():
+    assert IJsselsteinloop.bin_categories(pd.Series([0, 25, 50, 51, None]), [10, 20, 30, 40, 50], lower=1, out_of_range='nan').astype(object).fillna('-').tolist() == ['-', '21 - 30', '41 - 50', '-', '-']
+    assert IJsselsteinloop.bin_categories(pd.Series([0, 51]), [10, 20, 30, 40, 50], out_of_range='clip').cat.codes.tolist() == [0, 4]
+    with pytest.raises(ValueError):
+        IJsselsteinloop.bin_categories(pd.Series([51]), [10, 20, 30, 40, 50])
+    assert [IJsselsteinloop.bin_categories(pd.Series([0, 25, None], dtype=dtype), [10, 20, 30], lower=1, out_of_range='clip').cat.codes.tolist() for dtype in ['Int32', 'Float64']] == [[0, 2, -1]] * 2
+
+def test_rapport(tmp_path, monkeypatch):
+    import rapport_IJsselsteinloop
+    afstanden = benchmark_IJsselsteinloop.synthetische_afstanden()
+    uitslagen = benchmark_IJsselsteinloop.synthetische_uitslagen(3000)
+    uitslagen = IJsselsteinloop.compact(IJsselsteinloop.nettotijd_sec(IJsselsteinloop.gemeenten(IJsselsteinloop.nettotijd(IJsselsteinloop.woonplaatsen(IJsselsteinloop.namen(uitslagen))), afstanden)))
+    benchmark_IJsselsteinloop.synthetische_kaart(tmp_path / 'gemeenten.gpkg', n=5, punten=50)
+    kaart = IJsselsteinloop.kaart('grof', tmp_path / 'gemeenten.gpkg', tmp_path / 'kaart')
+    monkeypatch.setattr(rapport_IJsselsteinloop, 'kaart', kaart.assign(gemeentenaam=uitslagen.gemeente.value_counts().index[:len(kaart)].astype(str)))
+    assert rapport_IJsselsteinloop.renderen(uitslagen[uitslagen.jaar == 2019], 2019, tmp_path / 'rapport') == len(rapport_IJsselsteinloop.FIGUREN)
+    assert sorted(path.stem for path in (tmp_path / 'rapport' / '2019').glob('*.png')) == sorted(rapport_IJsselsteinloop.FIGUREN)
+    assert len(rapport_IJsselsteinloop.figuur_top10(uitslagen, 2019).axes[0].get_xticklabels()) == 10
+
+def test_importtijd():
+    assert importeren('from IJsselsteinloop import time_to_seconds, category')[1] == []
+    assert importeren('import IJsselsteinloop.hulp')[0] < 0.1
+    tijd, zwaar = importeren('import pandas\nimport IJsselsteinloop.opschonen\nfrom IJsselsteinloop import nettotijd, woonplaatsen, compact')
+    assert tijd < 0.1 and zwaar == ['pandas']
+
 def test_time_to_seconds():
     assert IJsselsteinloop.time_to_seconds('12:34:56') == 45296, "Should be 45296"
 
+def test_parse_tijden():
+    seconden, ongeldig = IJsselsteinloop.parse_tijden(pd.Series(['01:23:45', '01.23.45', '23:45', 'DNF', None]))
+    assert seconden.tolist() == [5025, 5025, 1425, 0, 0] and ongeldig.tolist() == [False, False, False, True, True]
+
+def test_nettotijd_sec():
+    assert IJsselsteinloop.nettotijd_sec(pd.DataFrame({'nettotijd': ['00:25:00', '00:20:00'], 'jaar': [2019] * 2, 'afstand': ['5 km'] * 2, 'klassement': ['Damesklassement'] * 2})).nettotijd_sec.tolist() == [1200, 1500]
+
 def test_nettotijd():
     assert sum([bool(re.match('0[0-6]:[0-5][0-9]:[0-5][0-9]', tijd)) for tijd in IJsselsteinloop.nettotijd(pd.DataFrame({'nettotijd': ['01.23.45', '01:23:45']})).nettotijd]) == 2
 
+def test_woonplaats_aliassen():
+    assert IJsselsteinloop.woonplaats_aliassen()['Loo'] == 'Loo Gld', "Should be 'Loo Gld'"
+
+def test_woonplaatsen():
+    assert IJsselsteinloop.woonplaatsen(pd.DataFrame({'woonplaats': [' Utrecgt', 'Den Bosch', 'Nergenshuizen', None]})).woonplaats.fillna('-').tolist() == ['Utrecht', "'s-Hertogenbosch", '-', '-']
+
+def test_plaatsnaam_index():
+    assert IJsselsteinloop.plaatsnaam_index().zoeken('Nieuwegeinn')[0] == 'Nieuwegein', "Should be 'Nieuwegein'"
+
+def test_woonplaatsen_drempel():
+    assert IJsselsteinloop.woonplaatsen(pd.DataFrame({'woonplaats': ['Nieuwegeinn', 'Italie']}), drempel=0.9).woonplaats.fillna('-').tolist() == ['Nieuwegein', '-']
+
+def test_voorstellen_woonplaatsen():
+    assert IJsselsteinloop.voorstellen_woonplaatsen(pd.DataFrame({'woonplaats': ['Boskop', 'Boskop', 'Utrecgt', 'Italie']})).values.tolist() == [['Boskop', 'Boskoop', 12 / 13, 2]]
+
 def test_gemeente():
     assert IJsselsteinloop.gemeenten(pd.DataFrame({'startnummer': [random.randint(0, 9999) for _ in range(20)], 'woonplaats': ['Zevenhuizen', 'Hoorn', 'Laren', 'Noordwijk', 'Beek', 'Scherpenzeel', 'Oosterhout', 'Achterveld', 'Nes', 'Voorst', 'Alphen', 'Buren', 'Den Hoorn', 'Huis ter Heide', 'Baarlo', 'Velp', 'Winsum', 'Klarenbeek', 'Rossum', 'Serooskerke'], 'jaar': random.choices(range(2000, 2004), k=20), 'afstand': random.choices(['5 km', '10 km', '21.1 km'], k=20), 'klassement': random.choices(['Damesklassement', 'Herenklassement'], k=20)})).shape[0] == 20, "Should be 20"
 
+
+def test_gemeente_afstanden(tmp_path):
+    gpd.GeoDataFrame({'gemeentenaam': ['IJsselstein', 'Lopik']}, geometry=[box(0, 0, 2000, 2000), box(3000, 4000, 5000, 6000)]).to_file(tmp_path / 'gemeenten.gpkg')
+    assert IJsselsteinloop.gemeente_afstanden(tmp_path / 'afstanden.csv', tmp_path / 'gemeenten.gpkg', tmp_path / 'kaart').tot_ijsselstein.tolist() == [0.0, 5.0]
+
+def test_kaart(tmp_path):
+    benchmark_IJsselsteinloop.synthetische_kaart(tmp_path / 'gemeenten.gpkg', n=3, punten=100)
+    kaarten = [IJsselsteinloop.kaart(resolutie, tmp_path / 'gemeenten.gpkg', tmp_path / 'kaart') for resolutie in IJsselsteinloop.RESOLUTIES]
+    hoekpunten = [benchmark_IJsselsteinloop.hoekpunten(kaart.geometry) for kaart in kaarten]
+    assert hoekpunten == sorted(hoekpunten, reverse=True) and hoekpunten[-1] < hoekpunten[0] / 4 and all(kaart.is_valid.all() for kaart in kaarten)
+    assert all(kaart.centroid_x.equals(kaarten[0].centroid_x) for kaart in kaarten) and kaarten[1] is IJsselsteinloop.kaart('fijn', tmp_path / 'gemeenten.gpkg', tmp_path / 'kaart')
+    assert [IJsselsteinloop.resolutie_voor(breedte) for breedte in [20000, 1200, 100]] == ['vol', 'middel', 'grof']
+
+def test_gemeente_afstanden_bron(tmp_path):
+    benchmark_IJsselsteinloop.synthetische_kaart(tmp_path / 'gemeenten.gpkg', n=3, punten=10)
+    def afstanden(**kwargs):
+        return IJsselsteinloop.gemeente_afstanden(tmp_path / 'afstanden.csv', tmp_path / 'gemeenten.gpkg', tmp_path / 'kaart', **kwargs).set_index('gemeente').tot_ijsselstein
+    assert afstanden()['IJsselstein'] == 0 and afstanden(referentie='Gemeente 0-0')['Gemeente 0-0'] == 0
+    benchmark_IJsselsteinloop.synthetische_kaart(tmp_path / 'gemeenten.gpkg', n=5, punten=10)
+    assert len(afstanden()) == 25 and afstanden()['IJsselstein'] == 0
+
+def test_gemeente_afstanden_tabel():
+    afstanden = pd.DataFrame({'gemeente': ['Zuidplas', 'Lansingerland', 'Hoorn'], 'tot_ijsselstein': [35.0, 40.0, 60.0]})
+    assert IJsselsteinloop.gemeenten(pd.DataFrame({'startnummer': ['1', '2', '3'], 'woonplaats': ['Zevenhuizen', 'Hoorn', None], 'jaar': [2019] * 3, 'afstand': ['5 km'] * 3, 'klassement': ['Damesklassement'] * 3}), afstanden).gemeente.fillna('-').tolist() == ['Zuidplas', 'Hoorn', '-']
+
+def test_pipeline(tmp_path, caplog):
+    def bron(n):
+        return pd.DataFrame({'naam': ['jan de Vries'] * n, 'woonplaats': ['IJsselstein'] * n, 'nettotijd': ['01.23.45'] * n})
+    stages = {'bron': IJsselsteinloop.Stage(bron, [], None), 'namen': IJsselsteinloop.Stage(IJsselsteinloop.namen, ['bron'], None), 'nettotijd': IJsselsteinloop.Stage(IJsselsteinloop.nettotijd, ['namen'], None)}
+    with caplog.at_level('INFO', logger='IJsselsteinloop'):
+        assert [IJsselsteinloop.pipeline('nettotijd', {'bron': {'n': n}}, stages, tmp_path).shape[0] for n in [2, 2, 3, 2, 3]] == [2, 2, 3, 2, 3]
+    assert [r.getMessage() for r in caplog.records].count('stage bron: running') == 2 and 'stage nettotijd: cached' in caplog.text
+    stages['bron'] = IJsselsteinloop.Stage(lambda n: bron(n + 1), [], None)
+    assert IJsselsteinloop.pipeline('bron', {'bron': {'n': 2}}, stages, tmp_path).shape[0] == 3 and len(list(tmp_path.glob('bron-*.pkl'))) == 1
+
+def test_code_versie_stabiel():
+    code = 'import hashlib, IJsselsteinloop\nprint(*[hashlib.sha1(IJsselsteinloop.code_versie(IJsselsteinloop.STAGES[stage].functie).encode()).hexdigest() for stage in ["ophalen_data", "lopers"]])'
+    versies = [subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, env={**os.environ, 'PYTHONHASHSEED': seed}).stdout for seed in ['1', '2']]
+    assert versies[0] == versies[1] and len(versies[0].split()) == 2
+
+def test_synthetische_uitslagen():
+    uitslagen = benchmark_IJsselsteinloop.synthetische_uitslagen(500)
+    assert IJsselsteinloop.parse_tijden(IJsselsteinloop.nettotijd(uitslagen).nettotijd)[1].sum() == 0 and not uitslagen.duplicated(['startnummer', 'jaar']).any()
+
+def test_naam_sleutel():
+    assert IJsselsteinloop.naam_sleutel('Woerden, Frans van') == IJsselsteinloop.naam_sleutel(' frans  WOERDEN') == 'frans woerden'
+
+def test_lopers():
+    uitslagen = pd.DataFrame({'naam': ['Frans Woerden', 'frans woerden', 'Frans Woerdem', 'Frans Woerdan', 'Micheal Woerden', 'Frans Woerden', None],
+                              'woonplaats': ['Mijdrecht', None, 'Mijdrecht', 'Lopik', 'Mijdrecht', 'Mijdrecht', None],
+                              'nettotijd': ['01.15.44', '01:15:40', '01:16:30', '00:50:00', '01:15:41', '01:20:00', '01:30:00'],
+                              'jaar': [1999, 2000, 2003, 2004, 2000, 2005, 2005], 'afstand': ['21.1 km'] * 7,
+                              'klassement': ['Herenklassement'] * 5 + ['Damesklassement'] * 2})
+    assert IJsselsteinloop.lopers(uitslagen).runner_id.fillna(-1).tolist() == [0, 0, 0, 1, 2, 3, -1]
+
+def test_lopers_zelfde_naam():
+    uitslagen = pd.DataFrame({'naam': ['Jan de Jong', 'Jan de Jong', 'Jan de Jong', 'jan de jong'], 'woonplaats': ['Rotterdam', 'IJsselstein', 'IJsselstein', 'Rotterdam'],
+                              'nettotijd': ['01:54:15', '02:08:53', '02:10:00', '01:55:00'], 'jaar': [2006, 2006, 2007, 2008], 'afstand': ['21.1 km'] * 4,
+                              'klassement': ['Herenklassement'] * 4})
+    assert IJsselsteinloop.lopers(uitslagen).runner_id.tolist() == [0, 1, 1, 0]
+
+def test_kubus(tmp_path):
+    uitslagen = pd.DataFrame({'jaar': [2018, 2018, 2018, 2019, 2019], 'afstand': ['5 km', '5 km', '10 km', '5 km', '5 km'], 'klassement': ['Damesklassement'] * 5,
+                              'gemeente': ['Lopik', 'Lopik', 'Lopik', 'Lopik', None], 'tot_ijsselstein': [5.0, 5.0, 5.0, 5.0, None], 'nettotijd_sec': [1500, 1700, 3000, 1600, 1800]})
+    IJsselsteinloop.kubus_bijwerken(uitslagen[uitslagen.jaar == 2018], path=tmp_path / 'kubus.parquet')
+    kubus = IJsselsteinloop.kubus_bijwerken(uitslagen, path=tmp_path / 'kubus.parquet')
+    assert kubus[['jaar', 'aantal', 'nettotijd_min', 'nettotijd_mediaan']].values.tolist() == [[2018, 2, 1500, 1600], [2018, 1, 3000, 3000], [2019, 1, 1600, 1600], [2019, 1, 1800, 1800]]
+    assert IJsselsteinloop.kubus_opvragen(kubus, ['afstand'], klassement='Damesklassement')[['aantal', 'nettotijd_min', 'tot_ijsselstein_gemiddeld']].values.tolist() == [[4, 1500, 5.0], [1, 3000, 5.0]]
+
+def test_rang_index():
+    uitslagen = pd.DataFrame({'jaar': [2019] * 6 + [2018], 'afstand': ['10 km'] * 7, 'klassement': ['Damesklassement'] * 7, 'nettotijd_sec': [2900, 2800, 2900, 3000, None, 2700, 3100]})
+    rangen = IJsselsteinloop.RangIndex(uitslagen).opvragen(['00:48:20', '00:43:20', 'DNF'], jaar=2019)
+    assert rangen[['rang', 'gelijk', 'percentiel', 'achterstand', 'gat']].fillna(-1).values.tolist() == [[3, 2, 80, 200, 100], [1, 0, 0, -100, -1], [-1, -1, -1, -1, -1]]
+
+def test_verwerken_in_delen(tmp_path):
+    uitslagen = benchmark_IJsselsteinloop.synthetische_uitslagen(1000)
+    afstanden = pd.DataFrame({'gemeente': pd.read_csv('data/plaatsnaam_gemeente.csv').gemeente.unique(), 'tot_ijsselstein': 10.0})
+    for evenement in ['a', 'b']:
+        IJsselsteinloop.schrijven_partities(uitslagen, [2018, 2019], tmp_path / 'evenementen' / evenement)
+    resultaten = IJsselsteinloop.verwerken_in_delen(directory=tmp_path / 'evenementen', uitvoer=tmp_path / 'verwerkt', chunk=20, max_workers=2, afstanden=afstanden)
+    verwerkt = IJsselsteinloop.nettotijd_sec(IJsselsteinloop.gemeenten(IJsselsteinloop.nettotijd(IJsselsteinloop.woonplaatsen(IJsselsteinloop.namen(IJsselsteinloop.lezen_uitslagen(directory=tmp_path / 'evenementen' / 'a')))), afstanden))
+    assert resultaten.groupby('evenement').rijen_uit.sum().tolist() == [len(verwerkt)] * 2
+    delen = pd.read_parquet(tmp_path / 'verwerkt' / 'a')
+    assert sorted(zip(delen.jaar, delen.startnummer, delen.gemeente.fillna('-'), delen.nettotijd_sec)) == sorted(zip(verwerkt.jaar, verwerkt.startnummer, verwerkt.gemeente.fillna('-'), verwerkt.nettotijd_sec))
+
+def test_datum_ijsselsteinloop():
+    assert [IJsselsteinloop.datum_ijsselsteinloop(jaar).isoformat() for jaar in [1999, 2000, 2003, 2019]] == ['1999-05-22', '2000-06-10', '2003-06-07', '2019-06-08']
+
+def test_ophalen_weer(tmp_path, monkeypatch):
+    monkeypatch.setattr(IJsselsteinloop.ophalen, 'response_cache', IJsselsteinloop.ResponseCache(tmp_path / 'cache'))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    etmgeg = io.BytesIO()
+    with zipfile.ZipFile(etmgeg, 'w') as z:
+        z.writestr('etmgeg_260.txt', 'BRON: KNMI\n\nTG = Etmaalgemiddelde temperatuur (in 0.1 graden Celsius)\n\n# STN,YYYYMMDD,   TG,   TN\n\n  260,19990522,  122,   61\n  260,20000610,  166,     \n')
+    IJsselsteinloop.response_cache.put(IJsselsteinloop.KNMI_DAGGEGEVENS.format(station=260), etmgeg.getvalue(), {})
+    IJsselsteinloop.knmi_daggegevens.cache_clear()
+    assert IJsselsteinloop.ophalen_weer(1999, 2000, offline=True).to_dict() == {'temperatuur': {'22-mei-1999': 12.2, '10-juni-2000': 16.6}}
+    IJsselsteinloop.knmi_daggegevens.cache_clear()
+
+def test_compact():
+    uitslagen = IJsselsteinloop.compact(pd.DataFrame({'startnummer': ['12', '-'], 'naam': [' Jan de Vries', 'Aart Stigter'], 'woonplaats': ['Utrecgt', 'IJsselstein'], 'nettotijd': ['01.23.45', '00:45:00'], 'jaar': [2019, 2019], 'klassement': ['Herenklassement'] * 2, 'afstand': ['10 km', '21.1 km']}))
+    uitslagen = IJsselsteinloop.nettotijd_sec(IJsselsteinloop.nettotijd(IJsselsteinloop.woonplaatsen(IJsselsteinloop.namen(uitslagen))))
+    assert uitslagen.dtypes.astype(str).tolist() == ['Int32', 'string', 'category', 'category', 'int16', 'category', 'category', 'Int32'] and uitslagen.woonplaats.tolist() == ['Utrecht', 'IJsselstein']
+    with pytest.raises(ValueError):
+        IJsselsteinloop.compact(pd.DataFrame({'klassement': ['Jeugdklassement']}))